@@ -0,0 +1,25 @@
+"""
+Writes files through a temporary file that is renamed over the original, so a file is never left
+half written, and other processes never read a partial file.
+The temporary file is named after the process, since worker processes can write the same file.
+"""
+import os
+from pathlib import Path
+
+
+def write_atomic(path: Path, data):
+    # Bytes are written as they are, and text as UTF-8
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        if isinstance(data, bytes):
+            with tmp_path.open('wb') as f:
+                f.write(data)
+        else:
+            with tmp_path.open('w', encoding='utf-8') as f:
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+    pass
@@ -0,0 +1,396 @@
+"""
+Compares the speed and peak memory use of the streaming docx parser against the original
+BeautifulSoup parser, which also shifted inner tags for every token property match, using all
+articles in data-articles.
+Both are checked to return exactly the same result for every article.
+
+Usage:
+    python bench_docx.py [repeat count]
+
+Requirements:
+    - pip install bs4
+"""
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List
+from zipfile import ZipFile
+
+from bs4 import BeautifulSoup, Tag
+
+from gen_docx import CONTENT_CLEAN_REGEX, DICT_MEANING_SPLIT_REGEX, DIFFICULT_WORD_SPLIT_REGEX, \
+    TOKEN_PROPERTY_REGEX, DocParser, ParseMode
+
+
+class LegacyDocParser(DocParser):
+    doc: BeautifulSoup
+    body: Tag
+    inner_tags: List
+    
+    def parse_token_properties(self, m):
+        index = m.start()
+        offset = len(m.group(0)) - len(m.group(2))
+        self.update_inner_tag_indices(index, offset)
+        
+        token_index = self.content_buffer_length + index + self.token_offset
+        self.token_properties[token_index] = m.group(1).strip(',').split(',') \
+            if m.group(1) else ['ignore']
+    
+        self.token_offset -= offset
+        return m.group(2)
+
+    def clean_regex(self, m):
+        index = m.start()
+        
+        offset = len(m.group(0)) - len(self.clean_regex_sub)
+        self.update_inner_tag_indices(index, offset)
+        
+        return self.clean_regex_sub
+
+    def update_inner_tag_indices(self, index, offset):
+        # The original fix up, which shifts every inner tag for every match
+        for prop in self.inner_tags:
+            if prop[0] > index:
+                prop[0] -= offset
+    
+    def parse(self, path, export_images: Path = None):
+        # The original parser, which builds the whole document with BeautifulSoup
+        self.zip_file = ZipFile(path)
+        # pprint(zip_file.namelist())
+
+        if not self.only_content:
+            exported_images = self.parse_rels(export_images)
+        
+            if export_images:
+                return exported_images
+    
+        doc_text = self.zip_file.read('word/document.xml').decode('utf-8')
+        self.doc = BeautifulSoup(doc_text, 'xml')
+        self.body = self.doc.body
+    
+        if not self.body:
+            return None
+    
+        mode = ParseMode.Properties
+        questions = []
+        difficult_words = []
+        props = dict(
+            title=None,
+            description=None,
+            preview=False,
+            image_align='',
+            grade=None,
+            score=None,
+            difficulty=None,
+            content=None,
+            questions=questions,
+            difficult_words=difficult_words,
+            word_count=0,
+            dictionary=dict(),
+        )
+        content = []
+        content_tags = []
+        content_length = 0
+        list_index = -1
+        skip_questions = False
+        question = None
+    
+        before_tags = []
+        inner_tags = []
+        after_tags = []
+        run_before_tags = []
+        run_after_tags = []
+
+        # A new dict for every document, since the result is held on to by batched callers
+        self.token_properties = dict()
+    
+        for p in self.body.find_all('w:p'):
+            properties_tag = p.find('pPr')
+            if not properties_tag:
+                properties_tag = self.doc.new_tag('p')
+            style_tag = properties_tag.find('pStyle')
+            style = style_tag['w:val'] if style_tag and style_tag.has_attr('w:val') else 'Normal'
+        
+            if mode == ParseMode.Properties:
+                text = LegacyDocParser.get_text(p).strip()
+            
+                if not text:
+                    continue
+            
+                if style == 'Heading1':
+                    props['title'] = text
+                elif style == 'Subtitle':
+                    props['description'] = text
+                elif style == 'ListParagraph':
+                    key, value = DocParser.PROP_REGEX.match(text).groups()
+                
+                    if key is not None:
+                        key = DocParser.PROP_KEY_REGEX.sub('_', key.lower())
+                        if key in DocParser.PROP_CONVERSIONS:
+                            value = DocParser.PROP_CONVERSIONS[key](value)
+                        props[key] = value
+                    else:
+                        pass
+                else:
+                    mode = ParseMode.Content
+                
+                if mode == ParseMode.Properties:
+                    continue
+
+            if style == 'Heading2':
+                mode = DocParser.select_mode(LegacyDocParser.get_text(p))
+                continue
+            
+            if mode == ParseMode.Content:
+                if style == 'ListParagraph':
+                    list_id_tag = properties_tag.find('numId')
+                    new_list_index = int(list_id_tag['w:val']) \
+                        if list_id_tag and list_id_tag.has_attr('w:val') else -1
+                
+                    if new_list_index != list_index:
+                        if list_index != -1:
+                            before_tags.append(('/ul', ''))
+                        list_index = new_list_index
+                        if list_index != -1:
+                            before_tags.append(('ul', ''))
+                else:
+                    if list_index != -1:
+                        before_tags.append(('/ul', ''))
+                        list_index = -1
+                    pass
+                
+                if list_index != -1:
+                    before_tags.append(('li', ''))
+                    after_tags.append(('/li', ''))
+            
+                text = []
+                start_index = content_length
+                text_length = 0
+            
+                for r in p.find_all('w:r'):
+                    run_before_tags.clear()
+                    run_after_tags.clear()
+                    run_start_index = text_length
+                    
+                    for child in r.contents:
+                        if child.name == 't':
+                            child_txt = str(child.string)
+                            # Trim whitespace at the start of a paragraph
+                            if not text:
+                                child_txt = child_txt.lstrip()
+                            if child_txt:
+                                text.append(child_txt)
+                                text_length += len(child_txt)
+                        elif child.name == 'br':
+                            # Trim trailing whitespace before other elements
+                            if text:
+                                text[-1] = text[-1].rstrip()
+                            inner_tags.append([text_length, ('br', '')])
+                            pass
+                        elif child.name == 'rPr':
+                            for style in child.contents:
+                                if style.name == 'b':
+                                    run_before_tags.append(['strong', ''])
+                                    run_after_tags.append(['/strong', ''])
+                                if style.name == 'color':
+                                    if not run_before_tags:
+                                        run_before_tags.append(['span', ''])
+                                        run_after_tags.append(['/span', ''])
+                                    
+                                    tag = run_before_tags[0]
+                                    tag[1] = (tag[1] + ' style="color:#' + style['w:val'] + '"').lstrip()
+                            pass
+                    
+                    if run_before_tags:
+                        for tag in run_before_tags:
+                            inner_tags.append([run_start_index, tag])
+                        run_before_tags.clear()
+                    if run_after_tags:
+                        for tag in run_after_tags:
+                            inner_tags.append([text_length, tag])
+                        run_after_tags.clear()
+                
+                if text and list_index == -1:
+                    before_tags.append(('p', ''))
+                    after_tags.append(('/p', ''))
+
+                if before_tags:
+                    content_tags += [
+                        (start_index, DocParser.tag(tag), DocParser.attribs(tag), dict())
+                        for tag in before_tags]
+                    before_tags.clear()
+                
+                if text:
+                    text = ''.join(text)
+                    
+                    # Clean and parse token properties
+                    self.content_buffer_length = start_index
+                    self.inner_tags = inner_tags
+                    self.token_offset = 0
+                    
+                    text = text.rstrip()
+                    for regex, sub in CONTENT_CLEAN_REGEX:
+                        self.clean_regex_sub = sub
+                        text = regex.sub(self.clean_regex, text)
+                    text = TOKEN_PROPERTY_REGEX.sub(self.parse_token_properties, text)
+                    text_length = len(text)
+                    
+                    content.append(f'{text}\n')
+                    content_length += len(text) + 1
+                    
+                    if inner_tags:
+                        content_tags += [
+                            (start_index + index, DocParser.tag(tag), DocParser.attribs(tag), dict())
+                            for index, tag in inner_tags]
+                        inner_tags.clear()
+                
+                if after_tags:
+                    content_tags += [
+                        (start_index + text_length, DocParser.tag(tag), DocParser.attribs(tag),
+                         dict())
+                        for tag in after_tags]
+                    after_tags.clear()
+                
+                continue
+
+            if mode == ParseMode.DifficultWords:
+                text = LegacyDocParser.get_text(p).strip()
+                if not text:
+                    continue
+                parts = DIFFICULT_WORD_SPLIT_REGEX.split(text)
+                if len(parts) < 2:
+                    print(f'Invalid difficult word format, expected "word - definition": "{text}"')
+                    continue
+                
+                word, definition = parts
+                difficult_words.append((word, definition))
+                continue
+            
+            if mode == ParseMode.Questions:
+                if skip_questions:
+                    continue
+                
+                text = LegacyDocParser.get_text(p).strip()
+                # Ignore template questions
+                if text.startswith('QUESTION'):
+                    skip_questions = True
+                    continue
+                
+                if not question:
+                    question = text
+                else:
+                    questions.append((question, text))
+                    question = None
+                continue
+
+            if mode == ParseMode.Dictionary:
+                text = LegacyDocParser.get_text(p).strip()
+                if not text:
+                    continue
+                
+                parts = [t.strip() for t in text.split(':')]
+                if len(parts) != 2:
+                    print(f'Invalid dictionary entry: "{text}", '
+                          f'Must have format "WORD:POS TAB MEANING"')
+                    continue
+                word, meaning = parts
+                word = word.lower()
+                parts = [t.strip() for t in DICT_MEANING_SPLIT_REGEX.split(meaning)]
+                if len(parts) != 2:
+                    print(f'Invalid dictionary meaning: "{meaning}", '
+                          f'Must have format "POS TAB MEANING"')
+                    continue
+
+                pos, meaning = parts
+                props['dictionary'][word] = f'{pos}\t{meaning}'
+                continue
+            
+            if mode == ParseMode.End:
+                break
+    
+        content = ''.join(content)
+        if content_length > 0:
+            content = content[:-1]
+        
+        if list_index != -1:
+            content_tags.append((len(content), '/ul', '', {}))
+
+        words_text = props['description'] + '\n' + content
+        props['word_count'] = self.word_count(words_text)
+        
+        props['content'] = content
+        props['content_tags'] = content_tags
+
+        self.zip_file.close()
+        
+        return props, self.token_properties
+
+    @staticmethod
+    def get_text(tag: Tag):
+        output = []
+        
+        for r in tag.find_all('w:r'):
+            for child in r.contents:
+                if child.name == 't':
+                    output.append(str(child.string))
+                elif child.name == 'br':
+                    output.append('\n')
+                elif child.name == 'tab':
+                    output.append('\t')
+        
+        return ''.join(output)
+
+    pass
+
+
+def parse_all(parser_type, files):
+    # Without the parse cache, so every document is really parsed
+    parser = parser_type(None)
+    return [parser.parse(file) for file in files]
+
+
+def measure(parser_type, files, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        parse_all(parser_type, files)
+    elapsed = (time.perf_counter() - start_time) / repeat
+
+    parser = parser_type(None)
+    peak = 0
+    for file in files:
+        tracemalloc.start()
+        parser.parse(file)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def run():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    files = [path for path in sorted(Path('data-articles').glob('*.docx'))
+             if not path.name.startswith('_')]
+    print(f'{len(files)} article(s)')
+
+    for expected, actual, file in zip(parse_all(LegacyDocParser, files),
+                                      parse_all(DocParser, files), files):
+        if expected != actual:
+            print(f'Mismatch for "{file.name}"')
+
+    legacy_time, legacy_peak = measure(LegacyDocParser, files, repeat)
+    stream_time, stream_peak = measure(DocParser, files, repeat)
+
+    print(f'BeautifulSoup: {legacy_time * 1000:.1f}ms per corpus'
+          f' ({legacy_time / len(files) * 1000:.2f}ms per article),'
+          f' peak memory {legacy_peak / 1024:.0f}KB per article')
+    print(f'Streaming:     {stream_time * 1000:.1f}ms per corpus'
+          f' ({stream_time / len(files) * 1000:.2f}ms per article),'
+          f' peak memory {stream_peak / 1024:.0f}KB per article')
+    print(f'Speed up:      {legacy_time / stream_time:.1f}x')
+    pass
+
+
+if __name__ == '__main__':
+    run()
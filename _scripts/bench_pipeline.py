@@ -0,0 +1,432 @@
+"""
+Benchmarks the whole article pipeline on synthetic corpora of 10, 1,000 and 10,000 articles.
+Articles are generated as .docx files in the structure DocParser expects, using the real word
+lists: a title, subtitle and properties, paragraphs with bold and coloured runs, line breaks and
+// token properties, lists, and the Questions, Difficult Words and Dictionary sections.
+Each corpus is built by ArticleGenerator in its own copy of the site, with the parse and NLP
+caches disabled, and the parse, scoring, NLP, highlight, render and index stages are timed
+separately.
+
+Usage:
+    python bench_pipeline.py [sizes] [options]
+
+- --stub-nlp: Tokenize with a blank spaCy pipeline and use each token's lower case text as its
+  lemma, so no spaCy model is needed. Words are then only highlighted in the form they are
+  listed in
+- --seed N: Generates a different corpus. Articles only depend on the seed and their number, so
+  smaller corpora are the start of larger ones
+- --dir DIR: Generate the corpora in DIR and keep them, so later runs reuse them. Defaults to a
+  temporary folder
+- --memory: Also record the peak memory of each stage, which is much slower
+- --trace DIR: Write the per-article report and Chrome trace of each corpus to DIR
+
+Requirements:
+    - pip install spacy titlecase PyHyphen
+    - python -m spacy download en_core_web_sm (Unless --stub-nlp is used)
+"""
+import argparse
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from contextlib import redirect_stdout
+from pathlib import Path
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from gen import ARTICLE_INDEX_FILE, INDEX_FILE, JSON_INDEX_FILE, NLP_BATCH_SIZE, NLP_MODEL, \
+    TPL_HTML_FILE, WORD_LISTS_DIR, ArticleGenerator
+from gen_docx import DocParser
+from gen_index import IndexWriter
+from profiler import profiler, span
+from readability import DALE_CHALL_FILE
+
+SIZES = (10, 1000, 10000)
+# Articles are passed to ArticleGenerator.build in chunks, like the chunks given to each worker
+CHUNK_SIZE = 256
+STUB_LEMMATIZER = 'bench_lower_lemmatizer'
+IMAGE_SIZE = (1200, 800)
+
+# Each stage that is reported, and the profiler spans it is made of
+STAGES = (
+    ('setup', ('setup', 'nlp_load', 'nlp_model_load')),
+    ('parse', ('parse', )),
+    ('score', ('score', )),
+    ('nlp', ('nlp_pipe', )),
+    ('highlight', ('highlight', )),
+    ('render', ('emit', 'template', 'write')),
+    ('index', ('index', )),
+)
+
+# How often each kind of markup is used
+LISTED_WORD_RATE = 0.2
+BOLD_RATE = 0.06
+COLOR_RATE = 0.03
+TOKEN_PROPERTY_RATE = 0.02
+LINE_BREAK_RATE = 0.05
+LIST_RATE = 0.5
+COLORS = ('C00000', '365F91', '00B050')
+
+W_NAMESPACES = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" ' \
+               'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+CONTENT_TYPES_XML = \
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' \
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">' \
+    '<Default Extension="png" ContentType="image/png"/>' \
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>' \
+    '<Default Extension="xml" ContentType="application/xml"/>' \
+    '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-' \
+    'officedocument.wordprocessingml.document.main+xml"/>' \
+    '</Types>'
+PACKAGE_RELS_XML = \
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' \
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">' \
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/' \
+    'relationships/officeDocument" Target="word/document.xml"/>' \
+    '</Relationships>'
+DOCUMENT_RELS_XML = \
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' \
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">' \
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/' \
+    'relationships/image" Target="/media/image.png"/>' \
+    '</Relationships>'
+
+
+class WordPool:
+    def __init__(self):
+        # Common words from the Dale-Chall list, and every term in the word lists the articles
+        # are highlighted with
+        with DALE_CHALL_FILE.open('r', encoding='utf-8') as f:
+            self.common = sorted(set(word.strip() for word in f if word.strip().isalpha()))
+
+        listed = set()
+        for path in sorted(WORD_LISTS_DIR.glob('words-*.txt')):
+            with path.open('r', encoding='utf-8') as f:
+                listed.update(word.strip() for word in f if word.strip())
+        self.listed = sorted(listed)
+        # Difficult words and dictionary entries can't contain the separators they're split on
+        self.single = [word for word in self.listed if word.isalpha()]
+        pass
+
+    def word(self, rng):
+        return rng.choice(self.listed if rng.random() < LISTED_WORD_RATE else self.common)
+
+    def words(self, rng, low, high):
+        return [self.word(rng) for _ in range(rng.randint(low, high))]
+
+    pass
+
+
+def sentence(words, end='.'):
+    text = ' '.join(words)
+    return text[0].upper() + text[1:] + end
+
+
+def run_xml(text, bold=False, color=None):
+    styles = []
+    if bold:
+        styles.append('<w:b/>')
+    if color:
+        styles.append(f'<w:color w:val="{color}"/>')
+    styles = f'<w:rPr>{"".join(styles)}</w:rPr>' if styles else ''
+
+    parts = []
+    for i, line in enumerate(text.split('\n')):
+        if i:
+            parts.append('<w:br/>')
+        for j, part in enumerate(line.split('\t')):
+            if j:
+                parts.append('<w:tab/>')
+            if part:
+                parts.append(f'<w:t xml:space="preserve">{escape(part)}</w:t>')
+    return f'<w:r>{styles}{"".join(parts)}</w:r>'
+
+
+def paragraph_xml(runs, style=None, num_id=None):
+    properties = []
+    if style:
+        properties.append(f'<w:pStyle w:val="{style}"/>')
+    if num_id is not None:
+        properties.append(f'<w:numPr><w:ilvl w:val="0"/><w:numId w:val="{num_id}"/></w:numPr>')
+    properties = f'<w:pPr>{"".join(properties)}</w:pPr>' if properties else ''
+    return f'<w:p>{properties}{"".join(runs)}</w:p>'
+
+
+def text_paragraph(text, style=None):
+    return paragraph_xml([run_xml(text)], style)
+
+
+def content_runs(rng, pool):
+    # A paragraph of a few sentences, split into runs with bold and coloured words, token
+    # properties and line breaks
+    words = []
+    for _ in range(rng.randint(2, 5)):
+        sentence_words = pool.words(rng, 6, 18)
+        sentence_words[0] = sentence_words[0][0].upper() + sentence_words[0][1:]
+        sentence_words[-1] += rng.choice('....?!')
+        words += sentence_words
+
+    runs = []
+    text = []
+    style = None
+    style_length = 0
+    for i, word in enumerate(words):
+        if style_length == 0 and style is not None:
+            runs.append(run_xml(' '.join(text) + ' ', *style))
+            text = []
+            style = None
+
+        if style is None and rng.random() < BOLD_RATE + COLOR_RATE:
+            if text:
+                runs.append(run_xml(' '.join(text) + ' '))
+                text = []
+            is_bold = rng.random() < BOLD_RATE / (BOLD_RATE + COLOR_RATE)
+            style = (True, None) if is_bold else (False, rng.choice(COLORS))
+            style_length = rng.randint(1, 3)
+
+        if rng.random() < TOKEN_PROPERTY_RATE:
+            word = rng.choice(('//', '//ignore,', '//noun,')) + word
+        if rng.random() < LINE_BREAK_RATE and i + 1 < len(words):
+            word += '\n'
+        text.append(word)
+        style_length = max(style_length - 1, 0)
+
+    if text:
+        runs.append(run_xml(' '.join(text), *style) if style else run_xml(' '.join(text)))
+    return runs
+
+
+def document_xml(rng, pool, number):
+    paragraphs = [
+        text_paragraph(f'Synthetic article {number}: ' + ' '.join(pool.words(rng, 2, 5)),
+                       'Heading1'),
+        text_paragraph(sentence(pool.words(rng, 8, 16)), 'Subtitle'),
+    ]
+    if rng.random() < 0.3:
+        paragraphs.append(text_paragraph('Image align: ' + rng.choice(('left', 'right')),
+                                         'ListParagraph'))
+    if rng.random() < 0.3:
+        paragraphs.append(text_paragraph('Ignore: ' + ' '.join(pool.words(rng, 1, 3)),
+                                         'ListParagraph'))
+
+    num_paragraphs = rng.randint(6, 12)
+    list_at = rng.randrange(1, num_paragraphs) if rng.random() < LIST_RATE else -1
+    for i in range(num_paragraphs):
+        if i == list_at:
+            num_id = rng.randint(1, 9)
+            for _ in range(rng.randint(3, 5)):
+                paragraphs.append(paragraph_xml([run_xml(sentence(pool.words(rng, 3, 8), ''))],
+                                                'ListParagraph', num_id))
+        paragraphs.append(paragraph_xml(content_runs(rng, pool)))
+
+    paragraphs.append(text_paragraph('Questions', 'Heading2'))
+    for _ in range(3):
+        paragraphs.append(text_paragraph(sentence(pool.words(rng, 5, 10), '?')))
+        paragraphs.append(text_paragraph(sentence(pool.words(rng, 3, 8))))
+
+    paragraphs.append(text_paragraph('Difficult Words', 'Heading2'))
+    for _ in range(rng.randint(3, 5)):
+        definition = ' '.join(rng.choice(pool.common) for _ in range(rng.randint(3, 8)))
+        paragraphs.append(text_paragraph(f'{rng.choice(pool.single)} - {definition}'))
+
+    paragraphs.append(text_paragraph('Dictionary', 'Heading2'))
+    for _ in range(rng.randint(2, 3)):
+        meaning = ' '.join(rng.choice(pool.common) for _ in range(rng.randint(2, 6)))
+        paragraphs.append(text_paragraph(f'{rng.choice(pool.single)}: noun\t{meaning}'))
+
+    return f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document {W_NAMESPACES}>' \
+           f'<w:body>{"".join(paragraphs)}<w:sectPr/></w:body></w:document>'
+
+
+def png_bytes(width, height):
+    # A blank greyscale PNG, which is all the pipeline needs to read the image size
+    def chunk(name, data):
+        return struct.pack('>I', len(data)) + name + data + \
+               struct.pack('>I', zlib.crc32(name + data))
+
+    rows = (b'\x00' + b'\xff' * width) * height
+    return b'\x89PNG\r\n\x1a\n' + \
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)) + \
+        chunk(b'IDAT', zlib.compress(rows, 9)) + \
+        chunk(b'IEND', b'')
+
+
+def create_site(root: Path, size, seed, pool, site_dir: Path):
+    # Lays out a copy of the site with `size` articles that have already been built once, so
+    # none of them are renamed or given new indices
+    scripts_dir = root / '_scripts'
+    articles_dir = scripts_dir / 'data-articles'
+    reuse = articles_dir.exists() and len(list(articles_dir.glob('*.docx'))) == size
+
+    if not reuse:
+        if root.exists():
+            shutil.rmtree(root)
+        articles_dir.mkdir(parents=True)
+        (root / 'img').mkdir()
+
+    # The shared inputs are copied every time, so reused corpora are built with the current ones
+    (scripts_dir / WORD_LISTS_DIR).mkdir(parents=True, exist_ok=True)
+    for path in list(WORD_LISTS_DIR.glob('words-*.txt')) + [DALE_CHALL_FILE]:
+        shutil.copy(path, scripts_dir / WORD_LISTS_DIR / path.name)
+    shutil.copy(site_dir / TPL_HTML_FILE.name, root / TPL_HTML_FILE.name)
+    shutil.copy(site_dir / ARTICLE_INDEX_FILE.name, root / ARTICLE_INDEX_FILE.name)
+    (scripts_dir / INDEX_FILE).write_text(f'{size + 1}\n', encoding='utf-8')
+    if reuse:
+        return scripts_dir, False
+
+    image = png_bytes(*IMAGE_SIZE)
+    for number in range(1, size + 1):
+        rng = random.Random(f'{seed}-{number}')
+        stem = f'{number:05d}-01-january-2022-synthetic-{number:05d}'
+        with ZipFile(articles_dir / f'{stem}.docx', 'w', ZIP_DEFLATED) as zip_file:
+            zip_file.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+            zip_file.writestr('_rels/.rels', PACKAGE_RELS_XML)
+            zip_file.writestr('word/_rels/document.xml.rels', DOCUMENT_RELS_XML)
+            zip_file.writestr('word/document.xml', document_xml(rng, pool, number))
+            zip_file.writestr('media/image.png', image)
+        (root / f'{stem}.html').touch()
+        (root / 'img' / f'synthetic-{number:05d}.jpg').write_bytes(image)
+
+    return scripts_dir, True
+
+
+def stub_nlp():
+    # A blank English pipeline with a "lemmatizer" that only lower cases each token, so it runs
+    # along with the components ArticleGenerator.analyse keeps enabled
+    import spacy
+    from spacy.attrs import LEMMA, LOWER
+    from spacy.language import Language
+
+    if not Language.has_factory(STUB_LEMMATIZER):
+        def lower_lemmas(doc):
+            doc.from_array([LEMMA], doc.to_array([LOWER]).reshape(-1, 1))
+            return doc
+        Language.component(STUB_LEMMATIZER, func=lower_lemmas)
+
+    nlp = spacy.blank('en')
+    nlp.add_pipe(STUB_LEMMATIZER, name='lemmatizer')
+    return nlp
+
+
+def build_site(args):
+    # Builds every article in the site, and returns the number of articles that failed
+    generator = ArticleGenerator()
+    # Parse every article, instead of reading them from the parse cache
+    generator.doc_parse = DocParser(None)
+    generator.nlp_batch_size = args.batch_size
+
+    with span('setup'):
+        if not generator.load():
+            raise Exception('Unable to load the template')
+        generator.load_nlp()
+        # Analyse every article, instead of reading them from the document cache
+        generator.doc_cache = None
+        if args.stub_nlp:
+            generator.nlp = stub_nlp()
+
+    files = ArticleGenerator.get_file_args(['data-articles'], None)
+    jobs, index = ArticleGenerator.plan(files, len(files) + 1)
+    index_writer = IndexWriter(INDEX_FILE, ARTICLE_INDEX_FILE, JSON_INDEX_FILE)
+
+    errors = []
+    for start in range(0, len(jobs), CHUNK_SIZE):
+        chunk = jobs[start:start + CHUNK_SIZE]
+        results = generator.build(chunk)
+
+        with span('index'):
+            for job, result in zip(chunk, results):
+                if result is None or 'error' in result:
+                    errors.append(result['error'] if result else f'{job["base_name"]} skipped')
+                    continue
+                index_writer.add_json(result['base_name'], result['props'])
+                generator.add_to_index(
+                    index_writer, job['output_name'], result['base_name'], result['props'])
+                index_writer.set_index(index, str(job['data_file']))
+
+    with span('index'):
+        index_writer.flush()
+
+    return errors
+
+
+def report(size, elapsed):
+    totals = dict()
+    for event in profiler.events:
+        totals[event['name']] = totals.get(event['name'], 0.0) + event['wall']
+
+    print(f'{"Stage":<12}{"Total s":>10}{"ms/article":>12}{"Share":>8}')
+    for stage, names in STAGES:
+        total = sum(totals.get(name, 0.0) for name in names)
+        print(f'{stage:<12}{total:>10.2f}{total / size * 1000:>12.2f}{total / elapsed:>8.1%}')
+    print(f'{"total":<12}{elapsed:>10.2f}{elapsed / size * 1000:>12.2f}'
+          f' ({size / elapsed:.1f} articles/s)')
+    pass
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sizes', nargs='*', type=int, default=list(SIZES),
+                        help='Number of articles in each corpus')
+    parser.add_argument('--stub-nlp', action='store_true',
+                        help='Use a blank spaCy pipeline instead of the model')
+    parser.add_argument('--seed', default='0', help='Seed for generating the articles')
+    parser.add_argument('--batch-size', type=int, default=NLP_BATCH_SIZE,
+                        help='Number of articles passed to spaCy at a time')
+    parser.add_argument('--dir', type=Path,
+                        help='Folder to generate the corpora in and keep them')
+    parser.add_argument('--memory', action='store_true',
+                        help='Record the peak memory of each stage')
+    parser.add_argument('--trace', type=Path,
+                        help='Folder to write the profile of each corpus to')
+    args = parser.parse_args()
+
+    if not args.stub_nlp:
+        import spacy
+        if not spacy.util.is_package(NLP_MODEL):
+            print(f'The spaCy model "{NLP_MODEL}" is not installed, use --stub-nlp to run'
+                  f' without it')
+            return
+
+    scripts_dir = Path.cwd()
+    site_dir = scripts_dir.parent
+    trace_dir = args.trace.resolve() if args.trace else None
+    pool = WordPool()
+    print(f'{len(pool.common)} common words, {len(pool.listed)} listed words,'
+          f' NLP: {"stub" if args.stub_nlp else NLP_MODEL}')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpora_dir = args.dir.resolve() if args.dir else Path(tmp_dir)
+
+        for size in args.sizes:
+            start_time = time.perf_counter()
+            root = corpora_dir / f'corpus-{args.seed}-{size}'
+            corpus_dir, created = create_site(root, size, args.seed, pool, site_dir)
+            elapsed = time.perf_counter() - start_time
+            print(f'\n== {size} article(s) =='
+                  f'\n{"Generated" if created else "Reused"} "{str(root)}" in {elapsed:.2f}s')
+
+            os.chdir(corpus_dir)
+            profiler.enable(trace_memory=args.memory)
+            try:
+                start_time = time.perf_counter()
+                # Silence the progress output for every article
+                with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                    errors = build_site(args)
+                elapsed = time.perf_counter() - start_time
+            finally:
+                os.chdir(scripts_dir)
+
+            report(size, elapsed)
+            if errors:
+                print(f'{len(errors)} article(s) failed, the first error was:\n{errors[0]}')
+            if trace_dir:
+                profiler.save(trace_dir / f'corpus-{size}')
+            profiler.drain()
+    pass
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,127 @@
+"""
+Compares the speed of the single pass readability counts against Textatistic, which
+DifficultyChecker used before, using all articles in data-articles. The single pass counts are
+timed hyphenating every word, with a syllable memo loaded from disk, as every new run starts, and
+with the memo already in memory.
+Every count and score is compared for every article. The Dale-Chall counts are expected to
+differ, since Textatistic has its own, longer, list of familiar words, so only the Dale-Chall and
+Bormuth scores depend on them. The grade DifficultyChecker uses doesn't.
+
+Usage:
+    python bench_readability.py [repeat count]
+
+Requirements:
+    - pip install textatistic
+"""
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from textatistic import Textatistic
+
+from gen_docx import DocParser
+from readability import TextStatistics
+from syllable_memo import SyllableMemo, hyphenate_syllables
+
+COUNTS = ('char_count', 'word_count', 'sent_count', 'sybl_count', 'polysyblword_count',
+          'notdalechall_count')
+SCORES = ('flesch_score', 'fleschkincaid_score', 'gunningfog_score', 'smog_score',
+          'dalechall_score')
+# The scores DifficultyChecker averages into the grade
+GRADE_SCORES = ('ari_score', 'fleschkincaid_score', 'coleman_liau_score', 'gunningfog_score')
+
+
+def legacy_dict(text):
+    # The data DifficultyChecker.run built from Textatistic
+    data = Textatistic(text).dict()
+    data['awl'] = data['char_count'] / data['word_count']
+    data['asl'] = data['word_count'] / data['sent_count']
+    data['asc'] = data['sent_count'] / data['word_count']
+    data['ari_score'] = 4.71 * data['awl'] + 0.5 * data['asl'] - 21.43
+    data['coleman_liau_score'] = 0.0588 * (data['awl'] * 100) - 0.296 * (data['asc'] * 100) - 15.8
+    return data
+
+
+def time_corpus(texts, repeat, score):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            score(text)
+    return (time.perf_counter() - start_time) / repeat
+
+
+def print_time(name, elapsed, num_texts, legacy_time):
+    print(f'{name:<22}{elapsed * 1000:>8.1f}ms per corpus, {elapsed / num_texts * 1000:>6.2f}ms'
+          f' per article, {legacy_time / elapsed:>5.1f}x')
+    pass
+
+
+def run():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    doc_parser = DocParser()
+    doc_parser.only_content = True
+    texts = []
+    for path in sorted(Path('data-articles').glob('*.docx')):
+        if path.name.startswith('_'):
+            continue
+        props, _ = doc_parser.parse(path)
+        texts.append(props['description'] + '\n' + props['content'])
+
+    num_words = 0
+    differences = {name: [] for name in COUNTS + SCORES + ('grade', )}
+    for text in texts:
+        expected = legacy_dict(text)
+        actual = TextStatistics(text, hyphenate_syllables).dict()
+        num_words += actual['word_count']
+
+        for name in COUNTS + SCORES:
+            differences[name].append(abs(actual[name] - expected[name]))
+        differences['grade'].append(abs(statistics.mean(actual[name] for name in GRADE_SCORES) -
+                                        statistics.mean(expected[name] for name in GRADE_SCORES)))
+
+    print(f'{len(texts)} article(s), {num_words} words')
+    print(f'{"":<22}{"Matching":>10}{"Max difference":>16}')
+    for name, values in differences.items():
+        matching = sum(1 for value in values if value < 1e-9)
+        print(f'{name:<22}{matching:>10}{max(values):>16.4f}')
+
+    legacy_time = time_corpus(texts, repeat, Textatistic)
+    print_time('Textatistic', legacy_time, len(texts), legacy_time)
+    hyphenate_time = time_corpus(
+        texts, repeat, lambda text: TextStatistics(text, hyphenate_syllables).dict())
+    print_time('Single pass', hyphenate_time, len(texts), legacy_time)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        memo_path = Path(tmp_dir) / 'syllables.pickle'
+        memo = SyllableMemo(memo_path)
+        for text in texts:
+            TextStatistics(text, memo.count)
+        memo.save()
+
+        # Each repeat starts with only the table on disk, like a new run
+        def score_from_disk():
+            disk_memo = SyllableMemo(memo_path)
+            for disk_text in texts:
+                TextStatistics(disk_text, disk_memo.count).dict()
+        disk_time = time_corpus([None], repeat, lambda _: score_from_disk())
+        print_time('Memo loaded from disk', disk_time, len(texts), legacy_time)
+
+        memo_time = time_corpus(
+            texts, repeat, lambda text: TextStatistics(text, memo.count).dict())
+        print_time('Memo in memory', memo_time, len(texts), legacy_time)
+
+        info = memo.count.cache_info()
+        disk_memo = SyllableMemo(memo_path)
+        for text in texts:
+            TextStatistics(text, disk_memo.count)
+        print(f'Memo: {len(memo.table)} word(s) in the table, {info.hits} LRU hit(s),'
+              f' {info.misses} LRU miss(es), {len(disk_memo.new_words)} word(s) hyphenated'
+              f' when loaded from disk')
+    pass
+
+
+if __name__ == '__main__':
+    run()
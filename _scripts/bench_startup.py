@@ -0,0 +1,60 @@
+"""
+Measures how long gen.py takes to start.
+Reports the slowest imports from `python -X importtime -c "import gen"`, then times complete
+gen.py runs with the given arguments, e.g. a run where every article is up to date.
+
+Usage:
+    python bench_startup.py [repeat count] [gen.py arguments]
+"""
+import os
+import subprocess
+import sys
+import time
+
+TOP_IMPORTS = 15
+
+
+def import_times(module):
+    # Returns the total import time, and the cumulative time of each module in microseconds
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        times.append((int(parts[1]), parts[2].rstrip()))
+
+    total = next((cumulative for cumulative, name in reversed(times)
+                  if name.strip() == module), 0)
+    return total, times
+
+
+def run():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    gen_args = sys.argv[2:]
+
+    total, times = import_times('gen')
+    print(f'import gen: {total / 1000:.0f}ms')
+    for cumulative, name in sorted(times, reverse=True)[:TOP_IMPORTS]:
+        print(f'  {cumulative / 1000:8.1f}ms {name}')
+
+    env = dict(os.environ, PYCHARM_HOSTED='1')
+    elapsed = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, 'gen.py'] + gen_args, env=env, stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, check=True)
+        elapsed.append(time.perf_counter() - start_time)
+
+    args_text = ' '.join(gen_args) if gen_args else '(last file)'
+    print(f'gen.py {args_text}: best {min(elapsed) * 1000:.0f}ms,'
+          f' worst {max(elapsed) * 1000:.0f}ms over {repeat} run(s)')
+    pass
+
+
+if __name__ == '__main__':
+    run()
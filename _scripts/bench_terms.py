@@ -0,0 +1,125 @@
+"""
+Compares the speed of the trie based multi-word term matcher against the original loop, which
+joins and looks up every possible term at every token, using all articles in data-articles.
+Both are checked to find the same terms at every token.
+
+Usage:
+    python bench_terms.py [repeat count]
+
+Requirements:
+    - pip install spacy (Only the tokenizer is used, so no model is needed)
+"""
+import re
+import sys
+import time
+from pathlib import Path
+
+import spacy
+
+from gen import WORD_LISTS_DIR
+from gen_docx import DocParser
+from gen_lexicon import Lexicon
+
+HYPEN_REGEX = re.compile(r'^[-–]+$')
+
+
+def legacy_match(tokens, start, word_list, longest_term):
+    # The original term lookup from ArticleGenerator.run
+    num_tokens = len(tokens)
+    token = tokens[start]
+    has_whitespace = bool(token.whitespace_)
+    terms = [(start, has_whitespace, token)]
+    j = start + 1
+    while j < num_tokens and len(terms) < longest_term:
+        term_token = tokens[j]
+        if term_token.whitespace_:
+            has_whitespace = True
+        if has_whitespace or not HYPEN_REGEX.match(term_token.orth_):
+            terms.append((j, has_whitespace, term_token))
+        j += 1
+
+    for j in range(len(terms), 1, -1):
+        sub_terms = terms[:j]
+        has_whitespace = any([bool(has_whitespace)
+                              for _, has_whitespace, term_token in sub_terms[:-1]])
+        sub_terms_strs = [term_token.orth_.lower()
+                          for _, _, term_token in sub_terms]
+
+        for delimiter in (' ', '-'):
+            require_whitespace = delimiter == ' '
+            if require_whitespace != has_whitespace:
+                continue
+
+            term_str = delimiter.join(sub_terms_strs)
+            if term_str in word_list:
+                return sub_terms[-1][0], term_str
+
+    return None
+
+
+def run():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    lexicon = Lexicon()
+    lexicon.load(WORD_LISTS_DIR)
+    word_list = lexicon.words
+    longest_term = lexicon.longest_term
+    term_matcher = lexicon.term_matcher
+
+    doc_parser = DocParser()
+    doc_parser.only_content = True
+    nlp = spacy.blank('en')
+    docs = []
+    for path in sorted(Path('data-articles').glob('*.docx')):
+        if path.name.startswith('_'):
+            continue
+        props, _ = doc_parser.parse(path)
+        docs.append(nlp(props['content']))
+
+    articles = []
+    num_tokens = 0
+    for doc in docs:
+        tokens = list(doc)
+        texts = [token.orth_.lower() for token in tokens]
+        spaces = [bool(token.whitespace_) for token in tokens]
+        articles.append((tokens, texts, spaces))
+        num_tokens += len(tokens)
+
+    print(f'{len(articles)} article(s), {num_tokens} tokens, {len(word_list)} terms,'
+          f' longest term: {longest_term} words')
+
+    num_matches = 0
+    for tokens, texts, spaces in articles:
+        for i in range(len(tokens)):
+            expected = legacy_match(tokens, i, word_list, longest_term)
+            actual = term_matcher.match(texts, spaces, i)
+            if expected != actual:
+                print(f'Mismatch at "{tokens[i].orth_}": {expected} != {actual}')
+            if expected:
+                num_matches += 1
+    print(f'{num_matches} term(s) found')
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for tokens, _, _ in articles:
+            for i in range(len(tokens)):
+                legacy_match(tokens, i, word_list, longest_term)
+    legacy_time = (time.perf_counter() - start_time) / repeat
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for tokens, texts, spaces in articles:
+            for i in range(len(tokens)):
+                term_matcher.match(texts, spaces, i)
+    trie_time = (time.perf_counter() - start_time) / repeat
+
+    print(f'Legacy loop: {legacy_time * 1000:.1f}ms per corpus'
+          f' ({legacy_time / num_tokens * 1e6:.2f}us per token)')
+    print(f'Trie:        {trie_time * 1000:.1f}ms per corpus'
+          f' ({trie_time / num_tokens * 1e6:.2f}us per token)')
+    print(f'Speed up:    {legacy_time / trie_time:.1f}x')
+    pass
+
+
+if __name__ == '__main__':
+    run()
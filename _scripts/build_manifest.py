@@ -0,0 +1,87 @@
+"""
+Keeps track of the inputs each article was last built from, so that articles whose inputs have not
+changed can be skipped.
+Files are only hashed again when their size or modification time changes, so checking an
+unchanged article only costs a few stat calls.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+from atomic_file import write_atomic
+
+MANIFEST_VERSION = 1
+
+
+class BuildManifest:
+    def __init__(self, path: Path):
+        self.path = path
+        self.files = dict()
+        self.articles = dict()
+        self.checked_files = dict()
+
+        if path.exists():
+            try:
+                with path.open('r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.files = data['files']
+                    self.articles = data['articles']
+            except (OSError, ValueError, KeyError):
+                print(f'Unable to read build manifest "{str(path)}", rebuilding all articles')
+        pass
+
+    def file_hash(self, path: Path):
+        key = str(path)
+        if key in self.checked_files:
+            return self.checked_files[key]
+
+        try:
+            stat = path.stat()
+        except OSError:
+            self.checked_files[key] = ''
+            return ''
+
+        entry = self.files.get(key)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            file_hash = entry[2]
+        else:
+            file_hash = hashlib.sha1()
+            with path.open('rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    file_hash.update(chunk)
+            file_hash = file_hash.hexdigest()
+            self.files[key] = [stat.st_mtime_ns, stat.st_size, file_hash]
+
+        self.checked_files[key] = file_hash
+        return file_hash
+
+    def fingerprint(self, inputs, version):
+        # Inputs are (role, path) pairs. Each input is keyed by its role rather than its file name,
+        # so renaming a new article after it is built doesn't change its fingerprint
+        fingerprint = hashlib.sha1(str(version).encode('utf-8'))
+        for role, path in inputs:
+            fingerprint.update(f'\n{role}:{self.file_hash(path)}'.encode('utf-8'))
+        return fingerprint.hexdigest()
+
+    def is_current(self, name, fingerprint):
+        return self.articles.get(name) == fingerprint
+
+    def update(self, name, fingerprint):
+        self.articles[name] = fingerprint
+        pass
+
+    def save(self):
+        # Forget about files that no longer exist, e.g. renamed articles
+        self.files = {key: value for key, value in self.files.items() if Path(key).exists()}
+
+        data = dict(
+            version=MANIFEST_VERSION,
+            files=self.files,
+            articles=self.articles,
+        )
+
+        write_atomic(self.path, json.dumps(data, indent='\t'))
+        pass
+
+    pass
@@ -0,0 +1,39 @@
+"""
+Limits the size of a cache folder with one file per entry. Caches mark an entry as used by
+updating its modification time, and the least recently used entries are removed first.
+"""
+from pathlib import Path
+
+
+def evict_least_recently_used(path: Path, pattern, max_size):
+    # Removes the oldest entries matching pattern until the entries fit in max_size bytes, and
+    # returns the number of entries removed
+    if not path.exists():
+        return 0
+
+    entries = []
+    total_size = 0
+    for entry_path in path.glob(pattern):
+        try:
+            stat = entry_path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry_path))
+        total_size += stat.st_size
+
+    if total_size <= max_size:
+        return 0
+
+    removed = 0
+    entries.sort()
+    for _, size, entry_path in entries:
+        if total_size <= max_size:
+            break
+        try:
+            entry_path.unlink()
+        except OSError:
+            continue
+        total_size -= size
+        removed += 1
+
+    return removed
@@ -106,7 +106,7 @@ class Checker:
             self.document_name = DOC_NAME_CLEAN_REGEX.sub('', text.stem)
         
             if text.suffix == '.docx':
-                props = self.doc_parser.parse(text)
+                props, _ = self.doc_parser.parse(text)
                 description = props['description'].rstrip('.')
                 content = props['content']
                 self.text = f'{description}\n{content}'
@@ -2,7 +2,6 @@
 Requirements:
     - pip install clipboard
     - pip install PyHyphen
-    - pip install textatistic
 """
 import os
 import re
@@ -11,9 +10,10 @@ from pathlib import Path
 from pprint import pprint
 
 import clipboard
-from textatistic import Textatistic
 
 from gen_docx import DocParser
+from readability import TextStatistics
+from syllable_memo import SyllableMemo
 
 DOC_NAME_CLEAN_REGEX = re.compile(r'^\d+-\d+-\w+-\d+-')
 
@@ -64,6 +64,8 @@ class DifficultyChecker:
             for p in in_args:
                 self.run(Path(p))
             pass
+        
+        SyllableMemo.shared().save()
         pass
     
     def run(self, text_or_path):
@@ -71,7 +73,7 @@ class DifficultyChecker:
             self.document_name = DOC_NAME_CLEAN_REGEX.sub('', text_or_path.stem)
         
             if text_or_path.suffix == '.docx':
-                props = self.doc_parser.parse(text_or_path)
+                props, _ = self.doc_parser.parse(text_or_path)
                 description = props['description'].rstrip('.')
                 content = props['content']
                 self.text = f'{description}\n{content}'
@@ -85,15 +87,7 @@ class DifficultyChecker:
 
         # readability.summarize(self.text)
 
-        s = Textatistic(self.text)
-        data = s.dict()
-        data['dale_chall_count'] = data['word_count'] - data['notdalechall_count']
-        data['awl'] = data['char_count'] / data['word_count']
-        data['asl'] = data['word_count'] / data['sent_count']
-        data['asc'] = data['sent_count'] / data['word_count']
-        data['afw'] = data['dale_chall_count'] / data['word_count']
-        self.calc_ari_score(data)
-        self.calc_coleman_liau_score(data)
+        data = TextStatistics(self.text).dict()
         self.calc_bormuth_score(data)
         # pprint(data)
 
@@ -321,17 +315,6 @@ class DifficultyChecker:
         
         return score, grade, diff
     
-    @staticmethod
-    def calc_ari_score(data):
-        data['ari_score'] = 4.71 * data['awl'] + 0.5 * data['asl'] - 21.43
-        pass
-    
-    @staticmethod
-    def calc_coleman_liau_score(data):
-        data['coleman_liau_score'] = 0.0588 * (data['awl'] * 100) -\
-            0.296 * (data['asc'] * 100) - 15.8
-        pass
-    
     @staticmethod
     def calc_bormuth_score(data):
         data['bormuth_score'] = 0.886593 -\
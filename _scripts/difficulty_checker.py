@@ -1,7 +1,9 @@
 """
+Run with --stream to score JSONL {"id", "text"} records from stdin. See score_corpus.py.
+
 Requirements:
     - pip install clipboard
-    - pip install textatistic
+    - pip install PyHyphen
 """
 import math
 import os
@@ -11,10 +13,9 @@ import sys
 import traceback
 from pathlib import Path
 
-import clipboard
-from textatistic import Textatistic
-
 from gen_docx import DocParser
+from readability import TextStatistics, scores
+from syllable_memo import SyllableMemo
 
 DOC_NAME_CLEAN_REGEX = re.compile(r'^\d+-\d+-\w+-\d+-')
 # DIFFICULTIES = ('Easy', 'Medium', 'Difficult', 'Very Difficult')
@@ -26,6 +27,11 @@ SCORE_ADJUSTMENTS = dict(
 DIFFICULTIES = (
     'Extremely Easy', 'Very Easy', 'Easy', 'Medium',
     'Difficult', 'Very Difficult')
+# The grade is the mean of these scores
+GRADE_SCORES = ('ari_score', 'fleschkincaid_score', 'coleman_liau_score', 'gunningfog_score')
+# Grades are normalised from 0-MAX_GRADE to a score of 0-MAX_SCORE
+MAX_GRADE = 13.0
+MAX_SCORE = 10
 
 DEBUG_OUTPUT = False
 
@@ -45,19 +51,20 @@ class DifficultyChecker:
     coleman_liau_score: float
     gunningfog_score: float
     
+    # The raw counts the scores were derived from, e.g. to cache them
+    counts: dict
+    
     def __init__(self):
         pass
     
     def run(self, text):
-        s = Textatistic(text)
-        data = s.dict()
-        data['dale_chall_count'] = data['word_count'] - data['notdalechall_count']
-        data['awl'] = data['char_count'] / data['word_count']
-        data['asl'] = data['word_count'] / data['sent_count']
-        data['asc'] = data['sent_count'] / data['word_count']
-        data['afw'] = data['dale_chall_count'] / data['word_count']
-        self.calc_ari_score(data)
-        self.calc_coleman_liau_score(data)
+        # Every score is derived from counts made in a single pass over the text
+        self.run_counts(TextStatistics(text).counts())
+        pass
+    
+    def run_counts(self, counts):
+        self.counts = counts
+        data = scores(counts)
         
         # for name, multiplier in SCORE_ADJUSTMENTS.items():
         #     data[name] *= multiplier
@@ -67,34 +74,28 @@ class DifficultyChecker:
         self.coleman_liau_score = data['coleman_liau_score']
         self.gunningfog_score = data['gunningfog_score']
         
-        scores = ('ari_score', 'fleschkincaid_score', 'coleman_liau_score', 'gunningfog_score')
-        self.grade = statistics.mean(data[name] for name in scores)
+        self.grade = statistics.mean(data[name] for name in GRADE_SCORES)
         self.score, self.score_nice = self.calculate_score(self.grade)
         self.difficulty = self.calculate_difficulty(self.score)
         
         pass
     
     @staticmethod
-    def calc_ari_score(data):
-        data['ari_score'] = 4.71 * data['awl'] + 0.5 * data['asl'] - 21.43
+    def save():
+        # Keeps the syllables counted for new words for the next run
+        SyllableMemo.shared().save()
         pass
     
-    @staticmethod
-    def calc_coleman_liau_score(data):
-        data['coleman_liau_score'] = 0.0588 * (data['awl'] * 100) - \
-                                     0.296 * (data['asc'] * 100) - 15.8
-        pass
-
     @staticmethod
     def calculate_score(grade):
-        score = min(max((grade / 13.0) * 10, 0), 10)
+        score = min(max((grade / MAX_GRADE) * MAX_SCORE, 0), MAX_SCORE)
         score_nice = round(score * 2) / 2
         return score, score_nice
         pass
 
     @staticmethod
     def calculate_difficulty(score):
-        index = round(score / 10 * (len(DIFFICULTIES) - 1))
+        index = round(score / MAX_SCORE * (len(DIFFICULTIES) - 1))
         return DIFFICULTIES[index]
     
     @staticmethod
@@ -115,6 +116,24 @@ class DifficultyChecker:
     pass
 
 
+def read_document(doc_parser, path: Path):
+    # The name, scored text and word count of a .docx or text file
+    document_name = DOC_NAME_CLEAN_REGEX.sub('', path.stem)
+    
+    if path.suffix == '.docx':
+        props, token_properties = doc_parser.parse(path)
+        description = props['description'].rstrip('.')
+        content = props['content']
+        text = f'{description}\n{content}'
+        word_count = props['word_count']
+    else:
+        with path.open('r', encoding='utf-8') as f:
+            text = f.read()
+            word_count = doc_parser.word_count(text)
+    
+    return document_name, text, word_count
+
+
 def run():
     f = None
     orig_stdout = None
@@ -130,27 +149,14 @@ def run():
     
     files = []
     if len(sys.argv) == 1:
+        import clipboard
         text = clipboard.paste()
         files.append(('Clipboard', text, doc_parser.word_count(text)))
         pass
     else:
         in_args = sys.argv[1:]
         for p in in_args:
-            path = Path(p)
-            document_name = DOC_NAME_CLEAN_REGEX.sub('', path.stem)
-            
-            if path.suffix == '.docx':
-                props, token_properties = doc_parser.parse(path)
-                description = props['description'].rstrip('.')
-                content = props['content']
-                text = f'{description}\n{content}'
-                word_count = props['word_count']
-            else:
-                with path.open('r', encoding='utf-8') as f:
-                    text = f.read()
-                    word_count = doc_parser.word_count(text)
-            
-            files.append((document_name, text, word_count))
+            files.append(read_document(doc_parser, Path(p)))
         pass
     
     for document_name, text, word_count in files:
@@ -170,6 +176,8 @@ def run():
             print('\t'.join(map(str, values)))
         pass
     
+    checker.save()
+    
     if DEBUG_OUTPUT:
         sys.stdout = orig_stdout
         f.close()
@@ -177,6 +185,12 @@ def run():
 
 
 if __name__ == '__main__':
+    if sys.argv[1:] == ['--stream']:
+        # Scores JSONL records from stdin until it is closed, without pausing, see score_corpus.py
+        from score_corpus import stream
+        stream()
+        sys.exit()
+    
     try:
         run()
     except Exception as e:
@@ -0,0 +1,73 @@
+"""
+A cache of analysed spaCy documents, one file per article.
+Entries are keyed by a hash of the text and the spaCy model that analysed it, so an article is
+only analysed again when its text changes or the model is updated.
+The cache is limited in size, and the least recently used entries are removed first.
+
+Requirements:
+    - pip install spacy (See full installation instructions: https://spacy.io/usage)
+"""
+import hashlib
+import os
+from pathlib import Path
+
+from spacy.tokens import DocBin
+
+from atomic_file import write_atomic
+from cache_eviction import evict_least_recently_used
+
+# Only what the highlighter reads is stored. Token indices and whitespace are always stored
+DOC_ATTRS = ('ORTH', 'LEMMA')
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class DocCache:
+    def __init__(self, path: Path, model_name: str, model_version: str,
+                 max_size=DEFAULT_MAX_SIZE):
+        self.path = path
+        self.model_name = model_name
+        self.model_version = model_version
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        pass
+
+    def key(self, text):
+        data = f'{self.model_name}\n{self.model_version}\n{text}'
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def entry_path(self, text):
+        return self.path / f'{self.key(text)}.spacy'
+
+    def get(self, vocab, text):
+        path = self.entry_path(text)
+
+        try:
+            with path.open('rb') as f:
+                doc_bin = DocBin().from_bytes(f.read())
+            # Mark as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        docs = list(doc_bin.get_docs(vocab))
+        if len(docs) != 1 or docs[0].text != text:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return docs[0]
+
+    def put(self, text, doc):
+        doc_bin = DocBin(attrs=DOC_ATTRS, store_user_data=False)
+        doc_bin.add(doc)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.entry_path(text), doc_bin.to_bytes())
+        pass
+
+    def evict(self):
+        return evict_least_recently_used(self.path, '*.spacy', self.max_size)
+
+    pass
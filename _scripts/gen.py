@@ -5,52 +5,75 @@ Usage:
   Will rename the .docx file to match
 - A .docx file with a corresponding html file: Will regenerate that html file
 - A folder: Will generate/regenerate all .docx or html files
+- Articles are only regenerated when their .docx, image, the template, the word lists or the
+  generator version change since the last build. -f/--force regenerates them regardless
+- -j/--jobs N: Build articles across N processes (0 uses all cores). The index files are still
+  only written by the main process
+- --nlp-batch-size N: Number of articles streamed through spaCy at a time
+- --nlp-compare: Also run the full spaCy pipeline on each article to report the time saved by only
+  running the components the lemmatizer needs
+- -w/--watch: Keep running and rebuild articles as they, the template or the word lists change
+- --profile: Time each stage of the build, and write a per-article report and a Chrome trace to
+  data/__profile (or --profile-dir)
 
 Requirements:
 - pip install titlecase (https://pypi.org/project/titlecase/)
-- pip install Pillow (https://pypi.org/project/Pillow/)
+- pip install Pillow (https://pypi.org/project/Pillow/) (Only for images that aren't JPEG, PNG or GIF)
 - pip install spacy (See full installation instructions: https://spacy.io/usage)
 """
+import argparse
 import json
+import math
 import os
-import pickle
 import re
-import sys
 import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from pprint import pprint
-from typing import List, Optional
-
-from PIL import Image
-from titlecase import titlecase
+from typing import Optional
 
+from build_manifest import BuildManifest
 from difficulty_checker import DifficultyChecker
 from gen_docx import DocParser
-
+from gen_emit import ContentEmitter
+from gen_index import IndexWriter
+from gen_template import ArticleTemplate
+from image_size import ImageSizeCache, image_size
+from profiler import profiler, span
+from syllable_memo import SyllableMemo
+from text_stats import TextStatsTable, content_hash
+from wechat_journal import WechatJournal, compact_journal
+
+# spaCy, the word lists and titlecase are only imported once an article needs them, so runs that
+# have nothing to build, or only extract images, start quickly
 DO_NLP = True
-CACHE_TOKENS = False
-if DO_NLP:
-    import spacy
+CACHE_TOKENS = True
 
 UPDATE_JSON_INDEX_ONLY = False
 
-TOKEN_CACHE_FILE = Path(r'data/__token_cache.pickle')
+DOC_CACHE_DIR = Path(r'data/__doc_cache')
+BUILD_MANIFEST_FILE = Path(r'data/__build_manifest.json')
+TEMPLATE_CACHE_FILE = Path(r'data/__template_cache.pickle')
+IMAGE_SIZE_CACHE_FILE = Path(r'data/__image_sizes.json')
+PROFILE_DIR = Path(r'data/__profile')
+DOC_CACHE_MAX_SIZE = 64 * 1024 * 1024
+# The lemmatizer needs the POS tags from the tagger and attribute ruler. Everything else, e.g. the
+# parser and NER, is disabled while analysing articles
+NLP_COMPONENTS = ('tok2vec', 'tagger', 'attribute_ruler', 'lemmatizer')
+NLP_BATCH_SIZE = 16
+WATCH_INTERVAL = 1.0
 
 SLUG_REGEXES = (
     (re.compile(r'\s*\(\d+\)$'), ''),
     (re.compile(r'\W+'), '-'),
 )
 PROP_REGEX = re.compile(r'^\[(.+)\]$')
-CONTENT_INDENT_REGEX = re.compile(r'^(\s*).*__CONTENT__', re.MULTILINE)
 BASE_NAME_REGEX = re.compile(r'\d+-\d+-[a-z]+-\d+-', re.MULTILINE)
 FILENAME_DATE_REGEX = re.compile(r'\d+-(\d+-[a-zA-Z]+-\d+).+')
 SLUG_TO_TITLE_REGEX = re.compile(r'-+')
 IGNORE_LIST_SPLIT_REGEX = re.compile(r'\s+')
-TERM_SPLIT_REGEX = re.compile(r'[-–\s]+')
-HYPEN_REGEX = re.compile(r'^[-–]+$')
-ARTICLE_INDEX_LIST_END_REGEX = re.compile(r'([ \t]*)(<!-- __LIST_END__ -->)')
 QUESTIONS_REGEX = re.compile(r'(\t*)__\[QUESTIONS__(.+)__QUESTIONS]__\n*', re.DOTALL)
 QUESTION_REGEX = re.compile(r'(\t+)__\[QUESTION__(.+)__QUESTION]__', re.DOTALL)
 DIFFICULT_WORDS_REGEX = re.compile(r'(\t*)__\[DIFFICULT_WORDS__(.+)__DIFFICULT_WORDS]__\n*', re.DOTALL)
@@ -62,38 +85,82 @@ CLASS_LIST_SPLIT_REGEX = re.compile(r'\s+')
 DATA_BASE = Path('../data')
 ARTICLES_DATA_BASE = DATA_BASE / 'articles'
 TPL_HTML_FILE = Path('../_template.html')
+WORD_LISTS_DIR = Path('data')
 INDEX_FILE = Path('data/index')
 ARTICLE_INDEX_FILE = Path('../articles.html')
 JSON_INDEX_FILE = ARTICLES_DATA_BASE / 'articles_index.json'
+WECHAT_DATA_FILE = Path('data/wechat_import/data.json')
+WECHAT_JOURNAL_FILE = Path('data/wechat_import/data.jsonl')
 
 TITLE_ABBREVIATIONS = {'sa', 'uk'}
 
 VOCAB_SIZE = 'sm'
+NLP_MODEL = f'en_core_web_{VOCAB_SIZE}'
+
+# Increase whenever a change to the generator changes its output, so all articles are rebuilt
+GENERATOR_VERSION = 2
 
 
 class ArticleGenerator:
-    output_child: Optional[List]
-    output_paragraph: Optional[List]
-    output_parent: Optional[List]
-    
     def __init__(self):
-        self.content_indent = ''
-        
-        self.json_output = []
-        self.text_buffer = []
-        self.output_paragraph = None
-        self.output_parent = None
-        self.output_child = None
+        self.template = None
+        self.lexicon = None
+        self.doc_parse = DocParser()
+        self.checker = DifficultyChecker()
+        # Workers only read counts from the table. The main process adds the new counts and saves it
+        self.text_stats = TextStatsTable()
+        self.nlp = None
+        self.nlp_vocab = None
+        self.doc_cache = None
+        self.nlp_batch_size = NLP_BATCH_SIZE
+        self.nlp_compare = False
+        self.emitter = ContentEmitter()
+        self.lexicon_stamps = None
         pass
 
     @staticmethod
-    def get_file_args(last_file):
-        if len(sys.argv) == 1:
+    def parse_args():
+        parser = argparse.ArgumentParser()
+        parser.add_argument('paths', nargs='*',
+                            help='.docx files or folders to generate. Defaults to the last file')
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='Number of processes to build articles with, 0 to use all cores')
+        parser.add_argument('-f', '--force', action='store_true',
+                            help='Rebuild articles even if none of their inputs have changed')
+        parser.add_argument('--nlp-batch-size', type=int, default=NLP_BATCH_SIZE,
+                            help='Number of articles passed to spaCy at a time')
+        parser.add_argument('--nlp-compare', action='store_true',
+                            help='Also time the full spaCy pipeline to report the time saved')
+        parser.add_argument('-w', '--watch', action='store_true',
+                            help='Keep running and rebuild articles when they, the template or the'
+                                 ' word lists change')
+        parser.add_argument('--interval', type=float, default=WATCH_INTERVAL,
+                            help='Seconds between checking for changes in watch mode')
+        parser.add_argument('--profile', action='store_true',
+                            help='Record the wall time, CPU time and peak memory of each stage')
+        parser.add_argument('--profile-dir', type=Path, default=PROFILE_DIR,
+                            help='Folder to write the profile report and trace to')
+        return parser.parse_args()
+
+    @staticmethod
+    def file_stamps(paths):
+        stamps = dict()
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            stamps[str(path)] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    @staticmethod
+    def get_file_args(paths, last_file):
+        if not paths:
             return [Path(last_file)] if last_file else []
     
         files = []
     
-        for arg in sys.argv[1:]:
+        for arg in paths:
             arg_path = Path(arg)
             is_file = arg_path.is_file()
         
@@ -104,7 +171,8 @@ class ArticleGenerator:
             if is_file and ():
                 continue
         
-            arg_files = arg_path.iterdir() if not is_file else (arg_path,)
+            # Sorted so that new articles are always given indices in the same order
+            arg_files = sorted(arg_path.iterdir()) if not is_file else (arg_path,)
         
             for file in arg_files:
                 if not file.exists():
@@ -117,6 +185,7 @@ class ArticleGenerator:
         return files
 
     def titlecase(self, text):
+        from titlecase import titlecase
         return titlecase(text, callback=self.titlecase_abbreviations)
 
     @staticmethod
@@ -124,179 +193,332 @@ class ArticleGenerator:
         if word.lower() in TITLE_ABBREVIATIONS:
             return word.upper()
 
-    @staticmethod
-    def add_to_json_index(base_name, props):
-        if not JSON_INDEX_FILE.exists():
-            data = dict(articles=[])
-        else:
-            with JSON_INDEX_FILE.open('r', encoding='utf-8') as f:
-                data = json.load(f)
-
-        new_data = dict(
-            slug=base_name,
-            title=props['title'],
-            difficulty=props['difficulty'],
-            wordCount=props['word_count'],
-            date=props['date']
-        )
-
-        found_match = False
-        for i in range(len(data['articles'])):
-            article_data = data['articles'][i]
-            if isinstance(article_data, list) and article_data[0] == base_name or \
-                    isinstance(article_data, dict) and article_data['slug'] == base_name:
-                data['articles'][i] = new_data
-                found_match = True
-                break
-        
-        if not found_match:
-            data['articles'].insert(0, new_data)
-        
-        with JSON_INDEX_FILE.open('w', encoding='utf-8') as f:
-            json.dump(data, f, indent='\t')
-        pass
-
-    def add_to_index(self, output_name, base_name, props):
-        # ArticleGenerator.add_to_json_index(base_name, props)
-        
-        if not ARTICLE_INDEX_FILE.exists():
-            print(f'Article index file not found "{ARTICLE_INDEX_FILE.name}"')
-            return
-
-        with ARTICLE_INDEX_FILE.open('r', encoding='utf-8') as f:
-            text = f.read()
-
-        m = ARTICLE_INDEX_LIST_END_REGEX.search(text)
-        if not m:
-            print('Cannot find list end in article index')
-            return
-
-        indent = m.group(1)
+    def add_to_index(self, index_writer, output_name, base_name, props):
+        # index_writer.add_json(base_name, props)
         base_name = SLUG_TO_TITLE_REGEX.sub(' ', base_name)
-        new_item = f'{indent}<li><a href="{output_name}.html">{self.titlecase(base_name)}</a></li>'
-        start, end = m.start(), m.end()
-        text = text[:start] + f'{new_item}\n{indent}{m.group(2)}' + text[end:]
-
-        with ARTICLE_INDEX_FILE.open('w', encoding='utf-8') as f:
-            f.write(text)
+        index_writer.add_article(output_name, self.titlecase(base_name))
         pass
     
-    def add_tags(self, content_text, content_tags):
-        inline_tags = {'br', '/li', '/p', 'span', '/span', '/b', '/strong', 'strong'}
-        block_tags = {'ul', '/ul', 'ol', '/ol'}
-        indent = ''
-        output = []
-        end_index = len(content_text)
-        for index, tag_name, attribs, data in reversed(content_tags):
-            if end_index != index:
-                output.append(content_text[index:end_index])
-        
-            if tag_name in block_tags and tag_name[0] != '/':
-                indent = indent[:-1]
-        
-            pre_whitespace = ''
-            if index != 0 and tag_name not in inline_tags:
-                if tag_name in block_tags and tag_name[0] == '/':
-                    pre_whitespace += '\n'
-                pre_whitespace += f'{self.content_indent}{indent}'
-        
-            if tag_name in block_tags:
-                post_whitespace = '\n'
-            else:
-                post_whitespace = ''
+    def load(self):
+        if not TPL_HTML_FILE.exists():
+            print(f'Cannot find template html file: "{str(TPL_HTML_FILE)}"')
+            return False
         
-            if tag_name == 'br':
-                post_whitespace = f'\n{self.content_indent}{indent}\t'
+        self.template = ArticleTemplate.load(TPL_HTML_FILE, TEMPLATE_CACHE_FILE)
+        if self.template is None:
+            return False
+        self.emitter = ContentEmitter(self.template.content_indent)
         
-            if attribs:
-                attribs = f' {attribs.lstrip()}'
-            
-            output.append(f'{pre_whitespace}<{tag_name}{attribs}>{post_whitespace}')
-            end_index = index
+        return True
+    
+    def load_nlp(self):
+        # Loads the word lists and the spaCy vocab once the first article reaches the NLP stage.
+        # They stay loaded between builds in watch mode, and the word lists are only loaded again
+        # when they change
+        import spacy
+        from gen_lexicon import Lexicon
         
-            if tag_name in block_tags and tag_name[0] == '/':
-                indent += '\t'
-            pass
+        lexicon_stamps = ArticleGenerator.file_stamps(sorted(WORD_LISTS_DIR.glob('words-*.txt')))
+        if lexicon_stamps != self.lexicon_stamps:
+            self.lexicon = Lexicon()
+            self.lexicon.load(WORD_LISTS_DIR)
+            self.lexicon_stamps = lexicon_stamps
         
-        return ''.join(reversed(output))
-
+        if self.nlp_vocab is not None:
+            return
+        
+        # Cached documents don't need the model, only a vocab to hold their strings
+        self.nlp_vocab = spacy.blank('en').vocab
+        
+        if CACHE_TOKENS:
+            from doc_cache import DocCache
+            model_version = spacy.util.get_package_version(NLP_MODEL) or ''
+            self.doc_cache = DocCache(DOC_CACHE_DIR, NLP_MODEL, model_version, DOC_CACHE_MAX_SIZE)
+        pass
+    
+    def load_model(self):
+        # The model is only loaded when an article isn't in the document cache
+        if self.nlp is None:
+            import spacy
+            self.nlp = spacy.load(NLP_MODEL)
+        pass
+    
     def run(self):
+        args = ArticleGenerator.parse_args()
+        
+        if args.profile:
+            profiler.enable()
+        
+        if args.watch:
+            self.watch(args)
+        else:
+            self.build_files(args, args.paths)
+        pass
+    
+    @staticmethod
+    def read_index():
+        # Returns the next article index and the last file built, or None if the index file is
+        # missing or invalid
         if not INDEX_FILE.exists():
             print(f'Cannot find index file: "{str(INDEX_FILE)}"')
-            return
-        if not TPL_HTML_FILE.exists():
-            print(f'Cannot find template html file: "{str(TPL_HTML_FILE)}"')
-            return
+            return None
         
-        with TPL_HTML_FILE.open('r', encoding='utf-8') as f:
-            tpl_data = f.read()
-            # Find content indentation
-            m = CONTENT_INDENT_REGEX.search(tpl_data)
-            self.content_indent = m.group(1) if m else ''
-    
         with INDEX_FILE.open('r', encoding='utf-8') as f:
             try:
                 value = f.read().strip().split('\n')
-                start_index, last_file = int(value[0]), value[1].strip() if len(value) > 1 else ''
-                start_last_file = last_file
+                return int(value[0]), value[1].strip() if len(value) > 1 else ''
             except ValueError:
                 value = re.sub(r'\s+', ' ', value[0])
                 print(f'Unable to parse index from index file: "{value}"')
-                return
-            index = start_index
-        
-        questions_tpl = ListTemplate()
-        tpl_data = questions_tpl.fetch(tpl_data, 'QUESTIONS', 'QUESTION')
-        if tpl_data is None:
-            print('Could not find questions section template')
+                return None
+    
+    def watch(self, args):
+        # Keeps running, and rebuilds the articles whose inputs change. Everything is built in this
+        # process, so spaCy, the word lists and the template only need to be loaded once
+        if args.jobs != 1:
+            print('Watch mode builds articles in a single process')
+            args.jobs = 1
+        
+        stamps = None
+        print(f'Watching for changes every {args.interval:g}s, press Ctrl+C to stop')
+        
+        try:
+            while True:
+                index_data = ArticleGenerator.read_index()
+                if index_data is None:
+                    return
+                
+                files = ArticleGenerator.get_file_args(args.paths, index_data[1])
+                shared_inputs = [TPL_HTML_FILE] + sorted(WORD_LISTS_DIR.glob('words-*.txt'))
+                new_stamps = ArticleGenerator.file_stamps(files + shared_inputs)
+                
+                if stamps is None or any(stamps.get(str(path)) != new_stamps.get(str(path))
+                                         for path in shared_inputs):
+                    # Articles that are already up to date are still skipped
+                    changed_files = files
+                else:
+                    changed_files = [file for file in files
+                                     if stamps.get(str(file)) != new_stamps.get(str(file))]
+                
+                if changed_files:
+                    start_time = time.perf_counter()
+                    self.build_files(args, changed_files)
+                    elapsed = time.perf_counter() - start_time
+                    print(f'[{datetime.now():%H:%M:%S}] Checked {len(changed_files)} file(s)'
+                          f' in {elapsed * 1000:.0f}ms')
+                    
+                    # Don't treat files that were renamed by the build as changes. Files that were
+                    # edited during the build keep their old stamps, so they are built again
+                    index_data = ArticleGenerator.read_index()
+                    if index_data is not None:
+                        files = ArticleGenerator.get_file_args(args.paths, index_data[1])
+                        for key, value in ArticleGenerator.file_stamps(files).items():
+                            new_stamps.setdefault(key, value)
+                
+                stamps = new_stamps
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            print('Stopped watching')
+        pass
+    
+    def build_files(self, args, paths):
+        if not TPL_HTML_FILE.exists():
+            print(f'Cannot find template html file: "{str(TPL_HTML_FILE)}"')
             return
         
-        diff_words_tpl = ListTemplate()
-        tpl_data = diff_words_tpl.fetch(tpl_data, 'DIFFICULT_WORDS', 'ITEM')
-        if tpl_data is None:
-            print('Could not find difficult words section template')
+        index_data = ArticleGenerator.read_index()
+        if index_data is None:
             return
+        start_index, last_file = index_data
+        start_last_file = last_file
         
-        files = ArticleGenerator.get_file_args(last_file)
+        files = ArticleGenerator.get_file_args(paths, last_file)
         if not files:
             print(f'No .md or .html files found in input')
             return
         
-        longest_term = 1
-        word_list = dict()
-        # for list_type in ('ielts', 'cet4', 'cet6'):
-        for list_type in ('ielts', 'cet6', 'extra'):
-            freqs = ('low', 'med', 'high') if list_type != 'extra' else ('', )
-            for freq in freqs:
-                freq_str = f'-{freq}' if freq else ''
-                with Path(f'data/words-{list_type}{freq_str}.txt').open('r', encoding='utf-8') as f:
-                    for word in f.read().splitlines():
-                        word = word.strip()
-                        word_count = len(TERM_SPLIT_REGEX.split(word))
-                        if word_count > longest_term:
-                            longest_term = word_count
-                        
-                        if word not in word_list:
-                            word_data = []
-                            word_list[word] = word_data
-                        else:
-                            word_data = word_list[word]
-    
-                        word_data.append((list_type, freq))
-                        
-        doc_parse = DocParser()
-        checker = DifficultyChecker()
-        
-        if DO_NLP:
-            nlp = spacy.load(f'en_core_web_{VOCAB_SIZE}')
+        with span('plan'):
+            jobs, index = ArticleGenerator.plan(files, start_index)
+        
+        manifest = BuildManifest(BUILD_MANIFEST_FILE)
+        # The index files are only written once, after all articles have been built
+        index_writer = IndexWriter(INDEX_FILE, ARTICLE_INDEX_FILE, JSON_INDEX_FILE)
+        wechat_journal = WechatJournal(WECHAT_JOURNAL_FILE)
+        skipped_count = 0
+        built_count = 0
+        failed_count = 0
+        if not UPDATE_JSON_INDEX_ONLY:
+            # The lexicon reads each word list by its name, so the name is part of its role
+            shared_inputs = [('template', TPL_HTML_FILE)] + \
+                [(f'word_list {path.stem}', path)
+                 for path in sorted(WORD_LISTS_DIR.glob('words-*.txt'))]
+            for job in jobs:
+                # Articles without an image only have their images extracted
+                if not job['image_path'].exists():
+                    continue
+                
+                with span('fingerprint', job['base_name']):
+                    job['fingerprint'] = manifest.fingerprint(
+                        [('docx', job['file']), ('image', job['image_path'])] + shared_inputs,
+                        GENERATOR_VERSION)
+                if not args.force and not job['is_new'] and \
+                        manifest.is_current(job['base_name'], job['fingerprint']):
+                    job['skip'] = True
+                    skipped_count += 1
+        
+        build_jobs = [job for job in jobs if not job.get('skip')]
+        
+        # Image sizes are read from the image headers, and cached between runs
+        image_sizes = ImageSizeCache(IMAGE_SIZE_CACHE_FILE)
+        for job in build_jobs:
+            if not job['image_path'].exists():
+                continue
+            try:
+                with span('image_size_cache', job['base_name']):
+                    job['img_size'] = image_sizes.get(job['image_path'])
+            except Exception:
+                # Reported when the article is built
+                pass
+        image_sizes.save()
+        
+        num_workers = min(args.jobs or os.cpu_count() or 1, len(build_jobs))
+        self.nlp_batch_size = max(args.nlp_batch_size, 1)
+        self.nlp_compare = args.nlp_compare
+        
+        if not build_jobs:
+            executor = None
+            results = []
+        elif num_workers > 1:
+            print(f'Building {len(build_jobs)} article(s) with {num_workers} processes')
+            # Give each process whole NLP batches, but make sure every process gets some work
+            chunk_size = min(self.nlp_batch_size, math.ceil(len(build_jobs) / num_workers))
+            chunks = [build_jobs[i:i + chunk_size]
+                      for i in range(0, len(build_jobs), chunk_size)]
+            executor = ProcessPoolExecutor(
+                max_workers=num_workers, initializer=init_worker,
+                initargs=(self.nlp_batch_size, self.nlp_compare, profiler.enabled))
+            results = ArticleGenerator.worker_results(executor.map(build_worker, chunks))
         else:
-            nlp = None
+            executor = None
+            with span('load'):
+                if not self.load():
+                    return
+            results = self.build(build_jobs)
+        
+        results = iter(results)
+        try:
+            # Shared files are only ever written by this process, in job order
+            for job in jobs:
+                last_file = str(job['data_file'])
+                if job.get('skip'):
+                    continue
+                
+                result = next(results)
+                if result is None:
+                    continue
+                if 'error' in result:
+                    failed_count += 1
+                    continue
+                
+                built_count += 1
+                base_name, props = result['base_name'], result['props']
+                
+                if result['text_stats'] is None:
+                    self.text_stats.remove(base_name)
+                else:
+                    self.text_stats.put(base_name, *result['text_stats'])
+                
+                if UPDATE_JSON_INDEX_ONLY:
+                    index_writer.add_json(base_name, props)
+                    continue
+                
+                with span('commit', base_name):
+                    wechat_journal.append(base_name, result['wechat'])
+                    
+                    if job['is_new']:
+                        file = job['file']
+                        rename_file = file.with_name(f'{job["output_name"]}.docx')
+                        file.rename(rename_file)
+                        last_file = str(rename_file)
+                        self.add_to_index(index_writer, job['output_name'], base_name, props)
+                    
+                    manifest.update(base_name, job['fingerprint'])
+            
+            # Update index
+            if index != start_index or last_file != start_last_file:
+                index_writer.set_index(index, last_file)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            
+            def save_manifest():
+                # Only saved once the index files are written. Otherwise the next build would skip
+                # renamed articles the index files don't list
+                if index_writer.changed():
+                    print('Build manifest not saved, since the index files were not written')
+                    return
+                manifest.save()
+            
+            def compact_wechat():
+                wechat_journal.close()
+                compact_journal(WECHAT_JOURNAL_FILE, WECHAT_DATA_FILE)
+            
+            # The index files are written first, since they must match the renamed articles. They
+            # are also written if the build stops early
+            save_steps = [('index_flush', index_writer.flush)]
+            if not UPDATE_JSON_INDEX_ONLY:
+                save_steps += [('manifest_save', save_manifest), ('wechat_compact', compact_wechat)]
+            save_steps.append(('text_stats_save', self.text_stats.save))
+            # Includes the syllables the workers counted, so they are shared with later runs
+            save_steps.append(('syllables_save', self.checker.save))
+            ArticleGenerator.run_save_steps(save_steps)
+        
+        print(f'Skipped {skipped_count}, rebuilt {built_count}, failed {failed_count} article(s)')
+        
+        if profiler.enabled:
+            profiler.save(args.profile_dir)
+            print(profiler.summary())
+            print(f'Profile written to "{str(args.profile_dir)}"')
+            profiler.drain()
+        pass
+    
+    @staticmethod
+    def run_save_steps(steps):
+        # Runs every step even if an earlier one fails, so one failed save can't stop the others
+        # from being written. The first error is raised once every step has run
+        error = None
+        for name, step in steps:
+            try:
+                with span(name):
+                    step()
+            except Exception as e:
+                print(f'Failed to run {name}:\n{traceback.format_exc()}')
+                if error is None:
+                    error = e
+        
+        if error is not None:
+            raise error
+        pass
+    
+    @staticmethod
+    def worker_results(outputs):
+        # Collects the spans recorded and syllables counted by the worker processes along with
+        # their results
+        memo = SyllableMemo.shared()
+        for results, events, new_words in outputs:
+            profiler.events += events
+            memo.new_words.update(new_words)
+            yield from results
+    
+    @staticmethod
+    def plan(files, index):
+        # Work out the output name of every file up front so that article indices are handed out
+        # in file order, no matter which process ends up building the article.
+        # New files without an image only have their images extracted, and don't use up an index
+        jobs = []
         
         for file in files:
-            print(f'-- Generating {file.stem} --')
             html_file = Path(f'../{file.stem}.html')
-            data_file = Path(f'data-articles/{file.stem}.docx')
-            last_file = str(data_file)
             is_new = not html_file.exists()
             
             if is_new:
@@ -305,288 +527,317 @@ class ArticleGenerator:
                 for regex, sub in SLUG_REGEXES:
                     slugged_name = regex.sub(sub, slugged_name).strip('-')
                 output_name = f'{index:02d}-{current_data}-{slugged_name}'
-                index += 1
             else:
                 output_name = file.stem
             
             base_name = BASE_NAME_REGEX.sub('', output_name)
-    
             image_path = Path(f'../img/{base_name}.jpg')
-            if not image_path.exists():
-                output_images = Path(f'../src/{base_name}.jpg')
-                exported_images = doc_parse.parse(data_file, output_images)
-                if not exported_images:
-                    print(f'Could not find image "{image_path}" and no images to export from doc')
-                else:
-                    extract_list = '", "'.join((f'{img.parent.name}/{img.name}'
-                                                for img in exported_images))
-                    print(f'Images extracted for: "{extract_list}"')
-
-                if is_new:
-                    index -= 1
-                    
-                continue
-            try:
-                with Image.open(image_path) as img:
-                    img_width, img_height = img.size
-            except Exception:
-                print(f'Unable to open image: "{str(image_path)}"')
-                img_width, img_height = 1200, 1200
-                
-            # Read data
-            props, token_properties = doc_parse.parse(data_file)
-            content_tags = props['content_tags']
-            dictionary = props['dictionary']
-            questions = props['questions']
-            difficult_words = props['difficult_words']
-            del props['content_tags']
-            del props['questions']
-            del props['difficult_words']
             
-            # Validate properties
-            for name in ['title', 'description', 'content']:
-                if props[name] is None:
-                    print(f'"{name}" property not found')
-                    props[name] = ''
-    
-            content_text = props['content']
-
-            props['is_new'] = is_new
-            props['date'] = FILENAME_DATE_REGEX.match(output_name).group(1)
-            props['title'] = self.titlecase(props['title'].lower())
-            props['description'] = props['description'].rstrip('.')
-    
-            props['image'] = base_name
-            props['preview'] = props['image'] if not props['preview'] else f'{base_name}-preview'
-            props['image_class'] = []
-            if props['image_align']:
-                props['image_class'].append('align-' + props['image_align'])
-            del props['image_align']
-            props['image_class'] = ' '.join(props['image_class'])
-            if props['image_class']:
-                props['image_class'] = ' ' + props['image_class']
+            if is_new and image_path.exists():
+                index += 1
             
-            # Calculate rating
-            if not props['difficulty'] or not props['grade']:
-                full_text = props['description'] + '\n' + content_text
-                checker.run(full_text)
-                
-                if not props['grade']:
-                    props['grade'] = checker.grade
-                    props['score'] = checker.score
-                    if not props['difficulty']:
-                        props['difficulty'] = checker.difficulty
-                else:
-                    props['score'], _ = checker.calculate_score(props['grade'])
-                    if not props['difficulty']:
-                        props['difficulty'] = checker.calculate_difficulty(props['score'])
+            jobs.append(dict(
+                file=file,
+                data_file=Path(f'data-articles/{file.stem}.docx'),
+                output_name=output_name,
+                base_name=base_name,
+                image_path=image_path,
+                is_new=is_new,
+            ))
+        
+        return jobs, index
+    
+    def build(self, jobs):
+        # Builds a batch of articles and writes their html files. Returns, for each job, the data
+        # the main process needs to update the shared index and export files, or None if the
+        # article was skipped
+        results = [None] * len(jobs)
+        articles = []
+        
+        for i, job in enumerate(jobs):
+            try:
+                with span('prepare', job['base_name']):
+                    article = self.prepare(job)
+            except Exception:
+                results[i] = ArticleGenerator.build_error(job)
+                continue
+            if article is None:
+                continue
             
-            grade = props['grade']
-            score = props['score']
-            props['score'] = f'{score:.2f}'
-            props['grade'] = f'{grade:.2f}'
-            props['score_nice'] = int(score)
-            props['grade_class'] = props['difficulty'].lower().replace(' ', '-')
-
             if UPDATE_JSON_INDEX_ONLY:
-                ArticleGenerator.add_to_json_index(base_name, props)
+                results[i] = dict(base_name=job['base_name'], props=article['props'],
+                                  text_stats=article['text_stats'])
                 continue
-
-            if DO_NLP or CACHE_TOKENS:
-                # Highlight IELTS words
-                combined_tags = []
-                content_tags_index = 0
-                
-                ignore_words = IGNORE_LIST_SPLIT_REGEX.split(props['ignore'])\
-                    if 'ignore' in props else []
-                ignore_words = set([word.lower() for word in ignore_words])
-    
-                doc = None
-                
-                if CACHE_TOKENS:
-                    if TOKEN_CACHE_FILE.exists():
-                        with TOKEN_CACHE_FILE.open('rb') as f:
-                            doc = pickle.load(f)
-                
-                if doc is None:
-                    if not DO_NLP:
-                        raise Exception('NLP document cache not found. Please set DO_NLP to True,'
-                                        ' run again to generate the cache, then DO_NLP can be set'
-                                        ' to false.')
-                    
-                    doc = nlp(content_text)
-    
-                    with TOKEN_CACHE_FILE.open('wb') as f:
-                        pickle.dump(doc, f)
-    
-                tokens = list(doc)
-                num_tokens = len(tokens)
-                i = 0
-                while i < num_tokens:
-                    token = tokens[i]
-                    i += 1
-                    word_text: str = token.orth_
-                    # upos = token.pos_
-                    lemma = str(token.lemma_).lower()
-                    token_index = token.idx
-                    token_props = token_properties[token_index]\
-                        if token_index in token_properties else []
-                    # print(f'{len(token)} "{token}"', token_props)
-                    
-                    # Find multi-word terms in the dictionary
-                    has_whitespace = bool(token.whitespace_)
-                    terms = [(i - 1, has_whitespace, token)]
-                    j = i
-                    while j < num_tokens and len(terms) < longest_term:
-                        term_token = tokens[j]
-                        if term_token.whitespace_:
-                            has_whitespace = True
-                        if has_whitespace or not HYPEN_REGEX.match(term_token.orth_):
-                            terms.append((j, has_whitespace, term_token))
-                        j += 1
-        
-                    for j in range(len(terms), 1, -1):
-                        sub_terms = terms[:j]
-                        has_whitespace = any([bool(has_whitespace)
-                                              for _, has_whitespace, term_token in sub_terms[:-1]])
-                        sub_terms_strs = [term_token.orth_.lower()
-                                          for _, _, term_token in sub_terms]
-        
-                        for delimiter in (' ', '-'):
-                            require_whitespace = delimiter == ' '
-                            # Don't allow whitespace beteen hyphens
-                            if require_whitespace != has_whitespace:
-                                continue
-        
-                            term_str = delimiter.join(sub_terms_strs)
-        
-                            if term_str in word_list:
-                                word_text = term_str
-                                lemma = term_str
-                                end_index = sub_terms[-1][0]
-                                i = end_index + 1
-                                j = False
-                                break
-                        
-                        if not j:
-                            break
-                        pass
-        
-                    # print(i - 1, word_text, f'{{{lemma}}}', f'"{token.whitespace_}"')
-        
-                    word_freq = None
-                    data_lemma = None
-                    
-                    if word_text.lower() not in ignore_words and 'ignore' not in token_props:
-                        if word_text in word_list:
-                            word_freq = word_list[word_text]
-                        elif lemma in word_list:
-                            word_freq = word_list[lemma]
-                            data_lemma = lemma
-                        
-                        if word_text in dictionary or lemma in dictionary:
-                            if not word_freq:
-                                word_freq = []
-                            word_freq.append(('def', ''))
-                            if not data_lemma and word_text not in dictionary:
-                                data_lemma = lemma
-                    
-                    if word_freq:
-                        data = dict(
-                            word_lists=set(
-                                [list_type for list_type, freq in word_freq] +
-                                [f'{list_type}-{freq}' for list_type, freq in word_freq if freq])
-                        )
-                        
-                        if data_lemma is not None:
-                            lemma_attr = f' data-lemma="{data_lemma}"'
-                            data['lemma'] = data_lemma
-                        else:
-                            lemma_attr = ''
-                        
-                        word_lists = ' '.join(list_type for list_type, freq in word_freq)
-                        freq_list = [f'{list_type}-{freq}' for list_type, freq in word_freq if freq]
-                        freqs = (' ' + ' '.join(freq_list)).rstrip()
-                        
-                        tag_name = 'span'
-                        attribs = f'class="word {word_lists}{freqs}"{lemma_attr} tabindex="-1"'
-                        
-                        while content_tags_index < len(content_tags):
-                            tag_data = content_tags[content_tags_index]
-                            tag_index = tag_data[0]
-                            if tag_index > token_index:
-                                break
-                            combined_tags.append(tag_data)
-                            content_tags_index += 1
-                            pass
-
-                        combined_tags.append((token_index, tag_name, attribs, data))
-                        combined_tags.append((token_index + len(word_text), f'/{tag_name}', '', dict()))
-                    
-                    pass
+            
+            articles.append((i, article))
+        
+        if DO_NLP or CACHE_TOKENS:
+            try:
+                with span('analyse'):
+                    docs = self.analyse([article for _, article in articles])
+            except Exception:
+                for i, article in articles:
+                    results[i] = ArticleGenerator.build_error(article['job'])
+                return results
+        else:
+            docs = [None] * len(articles)
         
-                if content_tags_index < len(content_tags):
-                    combined_tags += content_tags[content_tags_index:]
-                    pass
+        for (i, article), doc in zip(articles, docs):
+            try:
+                with span('render', article['job']['base_name']):
+                    results[i] = self.render(article, doc)
+            except Exception:
+                results[i] = ArticleGenerator.build_error(article['job'])
+        
+        return results
     
-                content_tags = combined_tags
-
-            # pprint(content_tags)
-            content_raw = content_text
-            content_text = self.add_tags(content_text, content_tags)
-            
-            props['content'] = content_text
+    @staticmethod
+    def build_error(job):
+        error = traceback.format_exc()
+        print(f'Failed to generate {job["file"].stem}:\n{error}')
+        return dict(error=error)
+    
+    def prepare(self, job):
+        # Parses and scores a single article, or extracts its images if it has none yet
+        file = job['file']
+        data_file = job['data_file']
+        output_name = job['output_name']
+        base_name = job['base_name']
+        image_path = job['image_path']
+        is_new = job['is_new']
+        doc_parse = self.doc_parse
+        checker = self.checker
+        
+        print(f'-- Generating {file.stem} --')
+        
+        if not image_path.exists():
+            output_images = Path(f'../src/{base_name}.jpg')
+            exported_images = doc_parse.parse(data_file, output_images)
+            if not exported_images:
+                print(f'Could not find image "{image_path}" and no images to export from doc')
+            else:
+                extract_list = '", "'.join((f'{img.parent.name}/{img.name}'
+                                            for img in exported_images))
+                print(f'Images extracted for: "{extract_list}"')
             
-            output_dict = []
-            for key, val in props['dictionary'].items():
-                key = key.replace('"', '\\"')
-                val = val.replace('"', '\\"')
-                output_dict.append(f'"{key}":"{val}"')
-            props['custom_dictionary'] = ','.join(output_dict)
-    
-            props['img_width'] = str(img_width)
-            props['img_height'] = str(img_height)
+            return None
+        try:
+            with span('image_size'):
+                img_width, img_height = job['img_size'] if 'img_size' in job \
+                    else image_size(image_path)
+        except Exception:
+            print(f'Unable to open image: "{str(image_path)}"')
+            img_width, img_height = 1200, 1200
             
-            # These properties should not substituted in the template
-            for key in ('ignore', ):
-                if key in props:
-                    del props[key]
+        # Read data
+        with span('parse'):
+            props, token_properties = doc_parse.parse(data_file)
+        content_tags = props['content_tags']
+        questions = props['questions']
+        difficult_words = props['difficult_words']
+        del props['content_tags']
+        del props['questions']
+        del props['difficult_words']
+        
+        # Validate properties
+        for name in ['title', 'description', 'content']:
+            if props[name] is None:
+                print(f'"{name}" property not found')
+                props[name] = ''
+
+        props['is_new'] = is_new
+        props['date'] = FILENAME_DATE_REGEX.match(output_name).group(1)
+        props['title'] = self.titlecase(props['title'].lower())
+        props['description'] = props['description'].rstrip('.')
+
+        props['image'] = base_name
+        props['preview'] = props['image'] if not props['preview'] else f'{base_name}-preview'
+        props['image_class'] = []
+        if props['image_align']:
+            props['image_class'].append('align-' + props['image_align'])
+        del props['image_align']
+        props['image_class'] = ' '.join(props['image_class'])
+        if props['image_class']:
+            props['image_class'] = ' ' + props['image_class']
+        
+        # Calculate rating
+        text_stats = None
+        if not props['difficulty'] or not props['grade']:
+            full_text = props['description'] + '\n' + props['content']
+            with span('score'):
+                # The counts are only made again when the text changes
+                text_hash = content_hash(full_text)
+                counts = self.text_stats.get(text_hash)
+                if counts is None:
+                    checker.run(full_text)
+                else:
+                    checker.run_counts(counts)
+            # Kept with the grade and difficulty set in the properties, so the article can be
+            # graded again without being built
+            text_stats = (text_hash, checker.counts, props['grade'], props['difficulty'])
             
-            output_html = tpl_data
+            if not props['grade']:
+                props['grade'] = checker.grade
+                props['score'] = checker.score
+                if not props['difficulty']:
+                    props['difficulty'] = checker.difficulty
+            else:
+                props['score'], _ = checker.calculate_score(props['grade'])
+                if not props['difficulty']:
+                    props['difficulty'] = checker.calculate_difficulty(props['score'])
+        
+        grade = props['grade']
+        score = props['score']
+        props['score'] = f'{score:.2f}'
+        props['grade'] = f'{grade:.2f}'
+        props['score_nice'] = int(score)
+        props['grade_class'] = props['difficulty'].lower().replace(' ', '-')
+
+        return dict(
+            job=job,
+            props=props,
+            token_properties=token_properties,
+            content_tags=content_tags,
+            questions=questions,
+            difficult_words=difficult_words,
+            img_width=img_width,
+            img_height=img_height,
+            text_stats=text_stats,
+        )
+    
+    def analyse(self, articles):
+        # Streams the content of all articles through spaCy in batches. Only the components that
+        # the lemmatizer depends on are run, since highlighting only needs each token's text,
+        # lemma, index and whitespace
+        docs = [None] * len(articles)
+        texts = []
+        
+        if not articles:
+            return docs
+        
+        with span('nlp_load'):
+            self.load_nlp()
+        with span('nlp_cache_read'):
+            for i, article in enumerate(articles):
+                text = article['props']['content']
+                if self.doc_cache is not None:
+                    docs[i] = self.doc_cache.get(self.nlp_vocab, text)
+                if docs[i] is None:
+                    texts.append((text, i))
+        
+        if self.doc_cache is not None:
+            print(f'NLP: {len(articles) - len(texts)} of {len(articles)} article(s) found in cache')
+        
+        if not texts:
+            return docs
+        
+        if not DO_NLP:
+            raise Exception('NLP document cache not found. Please set DO_NLP to True,'
+                            ' run again to generate the cache, then DO_NLP can be set'
+                            ' to false.')
+        
+        with span('nlp_model_load'):
+            self.load_model()
+        nlp = self.nlp
+        disable = [name for name in nlp.pipe_names if name not in NLP_COMPONENTS]
+        start_time = time.perf_counter()
+        
+        with span('nlp_pipe'):
+            for doc, i in nlp.pipe(texts, as_tuples=True, batch_size=self.nlp_batch_size,
+                                   disable=disable):
+                docs[i] = doc
+        
+        elapsed = time.perf_counter() - start_time
+        per_article = elapsed / len(texts) * 1000
+        disabled_names = ', '.join(disable) if disable else 'none'
+        print(f'NLP: {len(texts)} article(s) in {elapsed:.2f}s, {per_article:.1f}ms per article'
+              f' (disabled: {disabled_names})')
+        
+        if self.nlp_compare:
+            start_time = time.perf_counter()
+            for text, _ in texts:
+                nlp(text)
+            full_elapsed = time.perf_counter() - start_time
+            full_per_article = full_elapsed / len(texts) * 1000
+            print(f'NLP: Full pipeline takes {full_per_article:.1f}ms per article,'
+                  f' saved {full_per_article - per_article:.1f}ms per article')
+        
+        if self.doc_cache is not None:
+            with span('nlp_cache_write'):
+                for text, i in texts:
+                    self.doc_cache.put(text, docs[i])
+                self.doc_cache.evict()
+        
+        return docs
+    
+    def render(self, article, doc):
+        # Highlights and renders a single analysed article
+        job = article['job']
+        output_name = job['output_name']
+        base_name = job['base_name']
+        props = article['props']
+        token_properties = article['token_properties']
+        content_tags = article['content_tags']
+        questions = article['questions']
+        difficult_words = article['difficult_words']
+        img_width, img_height = article['img_width'], article['img_height']
+        content_text = props['content']
+        dictionary = props['dictionary']
+        
+        if doc is not None:
+            # Highlight IELTS words
+            ignore_words = IGNORE_LIST_SPLIT_REGEX.split(props['ignore'])\
+                if 'ignore' in props else []
+            ignore_words = set([word.lower() for word in ignore_words])
             
-            # Question substitutions
-            questions_text = questions_tpl.replace_items(('QUESTION', 'ANSWER'), questions)
-            output_html = questions_tpl.insert(output_html, questions_text)
-
-            # Difficult word substitutions
-            diff_words_text = diff_words_tpl.replace_items(('WORD', 'DEF'), difficult_words)
-            output_html = diff_words_tpl.insert(output_html, diff_words_text)
+            with span('highlight'):
+                content_tags = self.lexicon.highlight(
+                    doc, content_tags, token_properties, dictionary, ignore_words)
+
+        # pprint(content_tags)
+        # The html and the JSON content are built from the same pass over the tags
+        with span('emit'):
+            content_html, content = self.emitter.emit(content_text, content_tags)
+        
+        props['content'] = content_html
+        
+        output_dict = []
+        for key, val in props['dictionary'].items():
+            key = key.replace('"', '\\"')
+            val = val.replace('"', '\\"')
+            output_dict.append(f'"{key}":"{val}"')
+        props['custom_dictionary'] = ','.join(output_dict)
+
+        props['img_width'] = str(img_width)
+        props['img_height'] = str(img_height)
+        
+        # These properties should not substituted in the template
+        for key in ('ignore', ):
+            if key in props:
+                del props[key]
+        
+        # Questions, difficult words and properties are substituted in a single pass
+        with span('template'):
+            output_html = self.template.render(props, questions, difficult_words)
             
-            # Do substitutions
-            for key, value in props.items():
-                key = f'__{key.upper()}__'
-                output_html = output_html.replace(key, str(value))
-                
-            # Output
+        # Output
+        with span('write'):
             with Path(f'../{output_name}.html').open('w', encoding='utf-8') as f:
                 f.write(output_html)
             
-            self.wechat_export(base_name, props, content_raw, content_tags)
-
-            if is_new:
-                rename_file = file.with_name(f'{output_name}.docx')
-                file.rename(rename_file)
-                last_file = str(rename_file)
-                self.add_to_index(output_name, base_name, props)
-    
-        # Update index
-        if index != start_index or last_file != start_last_file:
-            with INDEX_FILE.open('w', encoding='utf-8') as f:
-                f.write('\n'.join([str(index), last_file]))
-        pass
+            ARTICLES_DATA_BASE.mkdir(parents=True, exist_ok=True)
+            with (ARTICLES_DATA_BASE / f'{base_name}.json').open('w', encoding='utf-8') as f:
+                json.dump(ArticleGenerator.get_json(props, content), f)
+        
+        return dict(
+            base_name=base_name,
+            props=props,
+            wechat=ArticleGenerator.get_wechat_data(props, content),
+            text_stats=article['text_stats'],
+        )
     
-    def wechat_export(self, base_name, props, content_text, content_tags):
-        self.parse_json(content_text, content_tags)
+    @staticmethod
+    def get_wechat_data(props, content):
         data = dict(
             title=props['title'],
             description=props['description'],
@@ -594,7 +845,7 @@ class ArticleGenerator:
             difficulty=props['difficulty'],
             grade=float(props['grade']),
             rating=float(props['score']),
-            content=self.json_output,
+            content=content,
             dictionary=props['dictionary'],
         )
         
@@ -602,140 +853,20 @@ class ArticleGenerator:
             date = datetime.strptime(props['date'], '%d-%B-%Y').replace(hour=12)
             data['date'] = date.isoformat()
         
-        import_data_file = Path('data/wechat_import/data.json')
-        if import_data_file.exists():
-            with import_data_file.open('r') as f:
-                import_data = json.load(f)
-        else:
-            import_data = dict()
-
-        import_data[base_name] = data
-
-        with import_data_file.open('w') as f:
-            json.dump(import_data, f, indent='\t')
-        
-        pass
-    
-    def json_reset(self):
-        self.text_buffer.clear()
-        self.json_output = []
-        self.text_buffer = []
-        self.output_paragraph = None
-        self.output_parent = None
-        self.output_child = None
-    
-    def push_text(self, text):
-        self.text_buffer.append(text)
-        pass
-    
-    def push_data(self, data):
-        self.flush_text()
-
-        self.ensure_para()
-        self.output_parent.append(data)
-        pass
-    
-    def new_paragraph(self):
-        self.flush_text()
-        self.pop_child()
-        self.output_paragraph = None
-        self.output_parent = None
-        pass
-    
-    def flush_text(self):
-        if not self.text_buffer:
-            return
-
-        self.ensure_para()
-        self.output_parent.append([''.join(self.text_buffer)])
-        self.text_buffer.clear()
-        pass
-    
-    def ensure_para(self):
-        if self.output_parent is None:
-            self.output_paragraph = []
-            self.output_parent = self.output_paragraph
-            self.json_output.append(self.output_parent)
-    
-    def push_child(self):
-        self.ensure_para()
-        self.output_child = []
-        self.output_parent.append(self.output_child)
-        self.output_parent = self.output_child
-    
-    def pop_child(self):
-        if self.output_child is None:
-            return
-
-        self.output_parent = self.output_paragraph
-        self.output_child = None
-    
-    def parse_json(self, content_text, content_tags):
-        end_index = 0
-        self.json_reset()
-        i = 0
-        while i < len(content_tags):
-            index, tag_name, _, data = content_tags[i]
-            i += 1
-        
-            # if tag_name[0] == '/':
-            #     continue
-        
-            # print(index, tag_name, data)
-        
-            if end_index != index:
-                self.push_text(content_text[end_index:index])
-                end_index = index
-        
-            if tag_name == 'p':
-                self.new_paragraph()
-                end_index = index
-                continue
-        
-            if tag_name == 'br':
-                self.push_text('\n')
-            if tag_name == 'ul':
-                self.new_paragraph()
-            if tag_name == '/ul':
-                # self.pop_child()
-                self.new_paragraph()
-            if tag_name == 'li':
-                # self.pop_child()
-                # self.new_paragraph()
-                self.push_data((chr(2),))
-                # self.push_child()
-                pass
-            elif tag_name == 'span':
-                self.flush_text()
-            
-                # Get the closing /span tag
-                index, _, _, _ = content_tags[i]
-                i += 1
-                run = [content_text[end_index:index]]
-                if 'word_lists' in data and data['word_lists']:
-                    run.append(' '.join(data['word_lists']))
-                if 'lemma' in data:
-                    run.append(data['lemma'])
-                self.push_data(run)
-                end_index = index
-                continue
-    
-        self.flush_text()
+        return data
     
-    def get_json(self, props, content_text, content_tags):
-        self.parse_json(content_text, content_tags)
-        
-        data = dict(
+    @staticmethod
+    def get_json(props, content):
+        return dict(
             title=props['title'],
             description=props['description'],
             wordCount=props['word_count'],
             difficulty=props['difficulty'],
             grade=float(props['grade']),
             rating=float(props['score']),
-            content=self.json_output,
+            content=content,
             date=props['date'],
         )
-        return data
     
     @staticmethod
     def parse_attribs(attribs):
@@ -746,65 +877,28 @@ class ArticleGenerator:
         return data
 
 
-class ListTemplate:
-    container_marker: str
-    indent: str
-    tpl: str
-    item_indent: str
-    item_tpl: str
-    
-    def fetch(self, tpl_data, container_marker, item_marker):
-        self.container_marker = container_marker
-        container_regex = re.compile(r'(\t*)__\[M__(.+)__M]__\n*'.replace('M', container_marker), re.DOTALL)
-        item_regex = re.compile(r'(\t+)__\[M__(.+)__M]__'.replace('M', item_marker), re.DOTALL)
+worker_generator: Optional[ArticleGenerator] = None
 
-        m = container_regex.search(tpl_data)
-        if not m:
-            return None
-        
-        tpl_start = tpl_data[:m.start()]
-        tpl_end = tpl_data[m.end():]
-        self.indent = m.group(1)
-        self.tpl = self.indent + m.group(2)
-        im = item_regex.search(self.tpl)
-        if not im:
-            print('Invalid item template')
-            return None
 
-        item_tpl_start = self.tpl[:im.start()]
-        item_tpl_end = self.tpl[im.end():]
-        self.item_indent = im.group(1)
-        self.item_tpl = im.group(2)
+def init_worker(nlp_batch_size, nlp_compare, profile):
+    global worker_generator
+    if profile:
+        # Forked workers start with a copy of the spans the parent had recorded
+        profiler.drain()
+        profiler.enable()
+    worker_generator = ArticleGenerator()
+    worker_generator.nlp_batch_size = nlp_batch_size
+    worker_generator.nlp_compare = nlp_compare
+    with span('load'):
+        if not worker_generator.load():
+            raise Exception('Unable to load article generator data')
 
-        self.tpl = f'{item_tpl_start}__CONTENT__{item_tpl_end}\n'
-        
-        return f'{tpl_start}__LIST_{container_marker}__{tpl_end}'
 
-    def replace_items(self, keys, data):
-        items = []
-        
-        for item in data:
-            text = self.item_tpl
-            
-            for key, value in zip(keys, item):
-                text = text.replace(f'__{key}__', value)
-            
-            items.append(text)
-        
-        if items:
-            text = self.replace_content('\n'.join(items))
-        else:
-            text = ''
-        
-        return text
-    
-    def replace_content(self, content):
-        return self.tpl.replace(f'__CONTENT__', content)
-    
-    def insert(self, data, content):
-        return data.replace(f'__LIST_{self.container_marker}__', content)
-    
-    pass
+def build_worker(jobs):
+    # The spans and new syllables are sent back with the results, so the parent can write a single
+    # report, and is the only process to save the syllable memo
+    results = worker_generator.build(jobs)
+    return results, profiler.drain(), SyllableMemo.shared().drain_new_words()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,28 @@
 import re
+import shutil
 import sys
+import zlib
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
 from pprint import pprint
-from typing import List
+from typing import Optional
 
-from bs4 import BeautifulSoup, Tag
-from zipfile import ZipFile
+from zipfile import ZipFile, ZipInfo
+
+from parse_cache import ParseCache
+from profiler import span
+
+try:
+    from lxml.etree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
 
 """
 Requirements:
-    - pip install bs4
+    - lxml is used to parse documents if it is installed, which is faster than the built in
+      ElementTree parser
 """
 
 CONTENT_CLEAN_REGEX = (
@@ -29,6 +41,28 @@ TOKEN_PROPERTY_REGEX = re.compile(r'//((?:[a-zA-Z0-9]+,)*)([-–\w]+)')
 DIFFICULT_WORD_SPLIT_REGEX = re.compile(r'\s*[-–:]\s*')
 DICT_MEANING_SPLIT_REGEX = re.compile(r'\t+')
 
+# Increase whenever the parsed output changes, so cached documents are parsed again
+PARSER_VERSION = 1
+# Next to the module rather than the working directory, so every caller shares the same cache
+PARSE_CACHE_DIR = Path(__file__).resolve().parent / 'data' / '__parse_cache'
+DOCUMENT_XML = 'word/document.xml'
+COPY_CHUNK_SIZE = 1024 * 1024
+EXTRACT_THREADS = 4
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY = f'{W_NS}body'
+W_P = f'{W_NS}p'
+W_R = f'{W_NS}r'
+W_PPR = f'{W_NS}pPr'
+W_PSTYLE = f'{W_NS}pStyle'
+W_NUMID = f'{W_NS}numId'
+W_VAL = f'{W_NS}val'
+
+
+def local_name(element):
+    # The tag name without its namespace
+    return element.tag.rpartition('}')[2] if isinstance(element.tag, str) else ''
+
 
 def to_bool(value):
     value = str(value).lower()
@@ -38,6 +72,44 @@ def to_bool(value):
     return False
 
 
+class OffsetMap:
+    """
+    Records where substitutions removed text from a paragraph, so that positions in the original
+    text can be moved to the substituted text in a single pass once the paragraph is complete.
+    Each substitution pass keeps the start of every match in order, along with the total number
+    of characters removed by the matches up to that point.
+    """
+    
+    def __init__(self):
+        self.passes = []
+        self.starts = None
+        self.removed = None
+        pass
+    
+    def start_pass(self):
+        self.starts = []
+        self.removed = [0]
+        self.passes.append((self.starts, self.removed))
+        pass
+    
+    def add(self, index, offset):
+        # Matches are found in order, so the starts are always sorted
+        self.starts.append(index)
+        self.removed.append(self.removed[-1] + offset)
+        pass
+    
+    def map(self, index):
+        for starts, removed in self.passes:
+            # Shift by every match starting before the index. A position inside a match can't
+            # move to before the start of that match
+            i = bisect_left(starts, index)
+            if i:
+                index = max(index - removed[i], starts[i - 1] - removed[i - 1])
+        return index
+    
+    pass
+
+
 class ParseMode(Enum):
     Properties = 1
     Content = 2
@@ -55,12 +127,12 @@ class DocParser:
     PROP_KEY_REGEX = re.compile(r'[\s_-]+')
     
     zip_file: ZipFile
-    doc: BeautifulSoup
-    body: Tag
+    found_body: bool
     only_content = False
-    inner_tags: List
+    offsets: OffsetMap
     
-    def __init__(self):
+    def __init__(self, cache_dir: Optional[Path] = PARSE_CACHE_DIR):
+        self.cache = ParseCache(cache_dir, PARSER_VERSION) if cache_dir is not None else None
         self.image_paths = dict()
         self.token_properties = dict()
         self.token_offset = 0
@@ -69,18 +141,21 @@ class DocParser:
         pass
     
     def parse_rels(self, export_images: Path):
-        rels_text = self.zip_file.read('word/_rels/document.xml.rels').decode('utf-8')
-        rels = BeautifulSoup(rels_text, 'xml')
+        with self.zip_file.open('word/_rels/document.xml.rels') as f:
+            rels = [dict(element.attrib) for _, element in iterparse(f)
+                    if local_name(element) == 'Relationship']
     
         is_first_image = True
         exported_images = []
-        for rel in rels.Relationships.find_all('Relationship'):
-            if not rel.has_attr('Type'):
+        extracted = dict()
+        copies = []
+        for rel in rels:
+            if 'Type' not in rel:
                 continue
             if rel['Type'] != 'http://schemas.openxmlformats.org/officeDocument/2006/' \
                               'relationships/image':
                 continue
-            if not rel.has_attr('Id') or not rel.has_attr('Target'):
+            if 'Id' not in rel or 'Target' not in rel:
                 continue
         
             r_id, r_path = rel['Id'], rel['Target']
@@ -93,36 +168,55 @@ class DocParser:
             self.image_paths[r_id] = r_path
         
             if export_images is not None:
+                info = self.zip_file.getinfo(r_path)
+                content_key = (info.CRC, info.file_size)
+                # The same image may be used more than once in a document
+                if content_key in extracted:
+                    continue
+                
                 rel_file = Path(r_path)
                 print(rel_file.suffix)
                 if rel_file.suffix == '.jpeg':
                     rel_file = rel_file.with_suffix('.jpg')
                 if is_first_image:
-                    output_file = export_images.with_name(
+                    base_file = export_images.with_name(
                         f'{export_images.stem}{rel_file.suffix}')
                     is_first_image = False
                 else:
-                    output_file = export_images.with_name(
+                    base_file = export_images.with_name(
                         f'{export_images.stem}__{r_id}{rel_file.suffix}')
-            
+                
+                # Reuse an image that has already been exported with the same content, otherwise
+                # find a free name
+                output_file = base_file
                 i = 1
-                while output_file.exists():
-                    output_file = output_file.with_name(
-                        f'{output_file.stem}_{i:02d}{output_file.suffix}')
-            
+                while output_file.exists() and not DocParser.same_content(output_file, info):
+                    output_file = base_file.with_name(
+                        f'{base_file.stem}_{i:02d}{base_file.suffix}')
+                    i += 1
+                
+                extracted[content_key] = output_file
                 exported_images.append(output_file)
-                with output_file.open('wb') as f:
-                    f.write(self.zip_file.read(r_path))
-                    pass
+                if not output_file.exists():
+                    copies.append((r_path, output_file))
                 pass
             pass
         
+        # Images are copied in chunks, so memory use doesn't depend on the image sizes.
+        # Decompression releases the GIL, so documents with many images are extracted in parallel
+        if len(copies) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(copies), EXTRACT_THREADS)) as executor:
+                for _ in executor.map(lambda copy: self.extract(*copy), copies):
+                    pass
+        elif copies:
+            self.extract(*copies[0])
+        
         return exported_images
 
     def parse_token_properties(self, m):
         index = m.start()
         offset = len(m.group(0)) - len(m.group(2))
-        self.update_inner_tag_indices(index, offset)
+        self.offsets.add(index, offset)
         
         token_index = self.content_buffer_length + index + self.token_offset
         self.token_properties[token_index] = m.group(1).strip(',').split(',') \
@@ -135,14 +229,26 @@ class DocParser:
         index = m.start()
         
         offset = len(m.group(0)) - len(self.clean_regex_sub)
-        self.update_inner_tag_indices(index, offset)
+        self.offsets.add(index, offset)
         
         return self.clean_regex_sub
-
-    def update_inner_tag_indices(self, index, offset):
-        for prop in self.inner_tags:
-            if prop[0] > index:
-                prop[0] -= offset
+    
+    def extract(self, name, output_file: Path):
+        with self.zip_file.open(name) as src, output_file.open('wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+        pass
+    
+    @staticmethod
+    def same_content(path: Path, info: ZipInfo):
+        # Compares a file with a zip member using the CRC32 stored in the zip
+        if path.stat().st_size != info.file_size:
+            return False
+        
+        crc = 0
+        with path.open('rb') as f:
+            for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+                crc = zlib.crc32(chunk, crc)
+        return crc == info.CRC
     
     @staticmethod
     def select_mode(heading):
@@ -156,21 +262,29 @@ class DocParser:
         return ParseMode.End
     
     def parse(self, path, export_images: Path = None):
-        self.zip_file = ZipFile(path)
+        # The document is opened once, and closed however parsing ends
+        with ZipFile(path) as zip_file:
+            self.zip_file = zip_file
+            return self.parse_zip(export_images)
+    
+    def parse_zip(self, export_images: Path = None):
         # pprint(zip_file.namelist())
+        
+        if export_images is None and self.cache is not None:
+            with span('docx_cache_read'):
+                result = self.cache.get(self.zip_file, DOCUMENT_XML)
+            if result is not None:
+                self.token_properties = result[1]
+                return result
 
         if not self.only_content:
-            exported_images = self.parse_rels(export_images)
+            with span('docx_rels'):
+                exported_images = self.parse_rels(export_images)
         
             if export_images:
                 return exported_images
     
-        doc_text = self.zip_file.read('word/document.xml').decode('utf-8')
-        self.doc = BeautifulSoup(doc_text, 'xml')
-        self.body = self.doc.body
-    
-        if not self.body:
-            return None
+        self.found_body = False
     
         mode = ParseMode.Properties
         questions = []
@@ -202,211 +316,226 @@ class DocParser:
         run_before_tags = []
         run_after_tags = []
 
-        self.token_properties.clear()
+        # A new dict for every document, since the result is held on to by batched callers
+        self.token_properties = dict()
     
-        for p in self.body.find_all('w:p'):
-            properties_tag = p.find('pPr')
-            if not properties_tag:
-                properties_tag = self.doc.new_tag('p')
-            style_tag = properties_tag.find('pStyle')
-            style = style_tag['w:val'] if style_tag and style_tag.has_attr('w:val') else 'Normal'
-        
-            if mode == ParseMode.Properties:
-                text = DocParser.get_text(p).strip()
+        # Closed even if the document is invalid, e.g. in a long watch session
+        with span('docx_body'), self.zip_file.open(DOCUMENT_XML) as doc_file:
+            for p in self.iter_paragraphs(doc_file):
+                properties_tag = next(p.iter(W_PPR), None)
+                style_tag = next(properties_tag.iter(W_PSTYLE), None) \
+                    if properties_tag is not None else None
+                style = style_tag.get(W_VAL, 'Normal') if style_tag is not None else 'Normal'
             
-                if not text:
-                    continue
-            
-                if style == 'Heading1':
-                    props['title'] = text
-                elif style == 'Subtitle':
-                    props['description'] = text
-                elif style == 'ListParagraph':
-                    key, value = DocParser.PROP_REGEX.match(text).groups()
+                if mode == ParseMode.Properties:
+                    text = DocParser.get_text(p).strip()
                 
-                    if key is not None:
-                        key = DocParser.PROP_KEY_REGEX.sub('_', key.lower())
-                        if key in DocParser.PROP_CONVERSIONS:
-                            value = DocParser.PROP_CONVERSIONS[key](value)
-                        props[key] = value
-                    else:
-                        pass
-                else:
-                    mode = ParseMode.Content
+                    if not text:
+                        continue
                 
-                if mode == ParseMode.Properties:
-                    continue
+                    if style == 'Heading1':
+                        props['title'] = text
+                    elif style == 'Subtitle':
+                        props['description'] = text
+                    elif style == 'ListParagraph':
+                        key, value = DocParser.PROP_REGEX.match(text).groups()
+                    
+                        if key is not None:
+                            key = DocParser.PROP_KEY_REGEX.sub('_', key.lower())
+                            if key in DocParser.PROP_CONVERSIONS:
+                                value = DocParser.PROP_CONVERSIONS[key](value)
+                            props[key] = value
+                        else:
+                            pass
+                    else:
+                        mode = ParseMode.Content
+                    
+                    if mode == ParseMode.Properties:
+                        continue
 
-            if style == 'Heading2':
-                mode = DocParser.select_mode(DocParser.get_text(p))
-                continue
-            
-            if mode == ParseMode.Content:
-                if style == 'ListParagraph':
-                    list_id_tag = properties_tag.find('numId')
-                    new_list_index = int(list_id_tag['w:val']) \
-                        if list_id_tag and list_id_tag.has_attr('w:val') else -1
+                if style == 'Heading2':
+                    mode = DocParser.select_mode(DocParser.get_text(p))
+                    continue
                 
-                    if new_list_index != list_index:
+                if mode == ParseMode.Content:
+                    if style == 'ListParagraph':
+                        list_id_tag = next(properties_tag.iter(W_NUMID), None) \
+                            if properties_tag is not None else None
+                        new_list_index = int(list_id_tag.get(W_VAL)) \
+                            if list_id_tag is not None and W_VAL in list_id_tag.attrib else -1
+                    
+                        if new_list_index != list_index:
+                            if list_index != -1:
+                                before_tags.append(('/ul', ''))
+                            list_index = new_list_index
+                            if list_index != -1:
+                                before_tags.append(('ul', ''))
+                    else:
                         if list_index != -1:
                             before_tags.append(('/ul', ''))
-                        list_index = new_list_index
-                        if list_index != -1:
-                            before_tags.append(('ul', ''))
-                else:
+                            list_index = -1
+                        pass
+                    
                     if list_index != -1:
-                        before_tags.append(('/ul', ''))
-                        list_index = -1
-                    pass
+                        before_tags.append(('li', ''))
+                        after_tags.append(('/li', ''))
                 
-                if list_index != -1:
-                    before_tags.append(('li', ''))
-                    after_tags.append(('/li', ''))
-            
-                text = []
-                start_index = content_length
-                text_length = 0
-            
-                for r in p.find_all('w:r'):
-                    run_before_tags.clear()
-                    run_after_tags.clear()
-                    run_start_index = text_length
-                    
-                    for child in r.contents:
-                        if child.name == 't':
-                            child_txt = str(child.string)
-                            # Trim whitespace at the start of a paragraph
-                            if not text:
-                                child_txt = child_txt.lstrip()
-                            if child_txt:
-                                text.append(child_txt)
-                                text_length += len(child_txt)
-                        elif child.name == 'br':
-                            # Trim trailing whitespace before other elements
-                            if text:
-                                text[-1] = text[-1].rstrip()
-                            inner_tags.append([text_length, ('br', '')])
-                            pass
-                        elif child.name == 'rPr':
-                            for style in child.contents:
-                                if style.name == 'b':
-                                    run_before_tags.append(['strong', ''])
-                                    run_after_tags.append(['/strong', ''])
-                                if style.name == 'color':
-                                    if not run_before_tags:
-                                        run_before_tags.append(['span', ''])
-                                        run_after_tags.append(['/span', ''])
-                                    
-                                    tag = run_before_tags[0]
-                                    tag[1] = (tag[1] + ' style="color:#' + style['w:val'] + '"').lstrip()
-                            pass
-                    
-                    if run_before_tags:
-                        for tag in run_before_tags:
-                            inner_tags.append([run_start_index, tag])
+                    text = []
+                    start_index = content_length
+                    text_length = 0
+                
+                    for r in p.iter(W_R):
                         run_before_tags.clear()
-                    if run_after_tags:
-                        for tag in run_after_tags:
-                            inner_tags.append([text_length, tag])
                         run_after_tags.clear()
-                
-                if text and list_index == -1:
-                    before_tags.append(('p', ''))
-                    after_tags.append(('/p', ''))
-
-                if before_tags:
-                    content_tags += [
-                        (start_index, DocParser.tag(tag), DocParser.attribs(tag), dict())
-                        for tag in before_tags]
-                    before_tags.clear()
-                
-                if text:
-                    text = ''.join(text)
-                    
-                    # Clean and parse token properties
-                    self.content_buffer_length = start_index
-                    self.inner_tags = inner_tags
-                    self.token_offset = 0
+                        run_start_index = text_length
+                        
+                        for child in r:
+                            child_name = local_name(child)
+                            if child_name == 't':
+                                child_txt = str(child.text)
+                                # Trim whitespace at the start of a paragraph
+                                if not text:
+                                    child_txt = child_txt.lstrip()
+                                if child_txt:
+                                    text.append(child_txt)
+                                    text_length += len(child_txt)
+                            elif child_name == 'br':
+                                # Trim trailing whitespace before other elements
+                                if text:
+                                    text[-1] = text[-1].rstrip()
+                                inner_tags.append([text_length, ('br', '')])
+                                pass
+                            elif child_name == 'rPr':
+                                for style in child:
+                                    style_name = local_name(style)
+                                    if style_name == 'b':
+                                        run_before_tags.append(['strong', ''])
+                                        run_after_tags.append(['/strong', ''])
+                                    if style_name == 'color':
+                                        if not run_before_tags:
+                                            run_before_tags.append(['span', ''])
+                                            run_after_tags.append(['/span', ''])
+                                        
+                                        tag = run_before_tags[0]
+                                        tag[1] = (tag[1] + ' style="color:#' +
+                                                  style.attrib[W_VAL] + '"').lstrip()
+                                pass
+                        
+                        if run_before_tags:
+                            for tag in run_before_tags:
+                                inner_tags.append([run_start_index, tag])
+                            run_before_tags.clear()
+                        if run_after_tags:
+                            for tag in run_after_tags:
+                                inner_tags.append([text_length, tag])
+                            run_after_tags.clear()
                     
-                    text = text.rstrip()
-                    for regex, sub in CONTENT_CLEAN_REGEX:
-                        self.clean_regex_sub = sub
-                        text = regex.sub(self.clean_regex, text)
-                    text = TOKEN_PROPERTY_REGEX.sub(self.parse_token_properties, text)
-                    text_length = len(text)
+                    if text and list_index == -1:
+                        before_tags.append(('p', ''))
+                        after_tags.append(('/p', ''))
+
+                    if before_tags:
+                        content_tags += [
+                            (start_index, DocParser.tag(tag), DocParser.attribs(tag), dict())
+                            for tag in before_tags]
+                        before_tags.clear()
                     
-                    content.append(f'{text}\n')
-                    content_length += len(text) + 1
+                    if text:
+                        text = ''.join(text)
+                        
+                        # Clean and parse token properties, and move the tags to the cleaned text
+                        with span('docx_tokens'):
+                            self.content_buffer_length = start_index
+                            self.offsets = OffsetMap()
+                            self.token_offset = 0
+                        
+                            text = text.rstrip()
+                            for regex, sub in CONTENT_CLEAN_REGEX:
+                                self.clean_regex_sub = sub
+                                self.offsets.start_pass()
+                                text = regex.sub(self.clean_regex, text)
+                            self.offsets.start_pass()
+                            text = TOKEN_PROPERTY_REGEX.sub(self.parse_token_properties, text)
+                            text_length = len(text)
+                        
+                            content.append(f'{text}\n')
+                            content_length += len(text) + 1
+                        
+                            if inner_tags:
+                                offsets = self.offsets
+                                content_tags += [
+                                    (start_index + offsets.map(index), DocParser.tag(tag),
+                                     DocParser.attribs(tag), dict())
+                                    for index, tag in inner_tags]
+                                inner_tags.clear()
                     
-                    if inner_tags:
+                    if after_tags:
                         content_tags += [
-                            (start_index + index, DocParser.tag(tag), DocParser.attribs(tag), dict())
-                            for index, tag in inner_tags]
-                        inner_tags.clear()
-                
-                if after_tags:
-                    content_tags += [
-                        (start_index + text_length, DocParser.tag(tag), DocParser.attribs(tag),
-                         dict())
-                        for tag in after_tags]
-                    after_tags.clear()
-                
-                continue
-
-            if mode == ParseMode.DifficultWords:
-                text = DocParser.get_text(p).strip()
-                if not text:
-                    continue
-                parts = DIFFICULT_WORD_SPLIT_REGEX.split(text)
-                if len(parts) < 2:
-                    print(f'Invalid difficult word format, expected "word - definition": "{text}"')
+                            (start_index + text_length, DocParser.tag(tag), DocParser.attribs(tag),
+                             dict())
+                            for tag in after_tags]
+                        after_tags.clear()
+                    
                     continue
-                
-                word, definition = parts
-                difficult_words.append((word, definition))
-                continue
-            
-            if mode == ParseMode.Questions:
-                if skip_questions:
+
+                if mode == ParseMode.DifficultWords:
+                    text = DocParser.get_text(p).strip()
+                    if not text:
+                        continue
+                    parts = DIFFICULT_WORD_SPLIT_REGEX.split(text)
+                    if len(parts) < 2:
+                        print(f'Invalid difficult word format, expected "word - definition": '
+                              f'"{text}"')
+                        continue
+                    
+                    word, definition = parts
+                    difficult_words.append((word, definition))
                     continue
                 
-                text = DocParser.get_text(p).strip()
-                # Ignore template questions
-                if text.startswith('QUESTION'):
-                    skip_questions = True
+                if mode == ParseMode.Questions:
+                    if skip_questions:
+                        continue
+                    
+                    text = DocParser.get_text(p).strip()
+                    # Ignore template questions
+                    if text.startswith('QUESTION'):
+                        skip_questions = True
+                        continue
+                    
+                    if not question:
+                        question = text
+                    else:
+                        questions.append((question, text))
+                        question = None
                     continue
-                
-                if not question:
-                    question = text
-                else:
-                    questions.append((question, text))
-                    question = None
-                continue
 
-            if mode == ParseMode.Dictionary:
-                text = DocParser.get_text(p).strip()
-                if not text:
+                if mode == ParseMode.Dictionary:
+                    text = DocParser.get_text(p).strip()
+                    if not text:
+                        continue
+                    
+                    parts = [t.strip() for t in text.split(':')]
+                    if len(parts) != 2:
+                        print(f'Invalid dictionary entry: "{text}", '
+                              f'Must have format "WORD:POS TAB MEANING"')
+                        continue
+                    word, meaning = parts
+                    word = word.lower()
+                    parts = [t.strip() for t in DICT_MEANING_SPLIT_REGEX.split(meaning)]
+                    if len(parts) != 2:
+                        print(f'Invalid dictionary meaning: "{meaning}", '
+                              f'Must have format "POS TAB MEANING"')
+                        continue
+
+                    pos, meaning = parts
+                    props['dictionary'][word] = f'{pos}\t{meaning}'
                     continue
                 
-                parts = [t.strip() for t in text.split(':')]
-                if len(parts) != 2:
-                    print(f'Invalid dictionary entry: "{text}", '
-                          f'Must have format "WORD:POS TAB MEANING"')
-                    continue
-                word, meaning = parts
-                word = word.lower()
-                parts = [t.strip() for t in DICT_MEANING_SPLIT_REGEX.split(meaning)]
-                if len(parts) != 2:
-                    print(f'Invalid dictionary meaning: "{meaning}", '
-                          f'Must have format "POS TAB MEANING"')
-                    continue
-
-                pos, meaning = parts
-                props['dictionary'][word] = f'{pos}\t{meaning}'
-                continue
+                if mode == ParseMode.End:
+                    break
             
-            if mode == ParseMode.End:
-                break
+        if not self.found_body:
+            return None
     
         content = ''.join(content)
         if content_length > 0:
@@ -421,7 +550,9 @@ class DocParser:
         props['content'] = content
         props['content_tags'] = content_tags
 
-        self.zip_file.close()
+        if self.cache is not None:
+            with span('docx_cache_write'):
+                self.cache.put(self.zip_file, DOCUMENT_XML, (props, self.token_properties))
         
         return props, self.token_properties
 
@@ -433,17 +564,48 @@ class DocParser:
     def attribs(tag):
         return '' if isinstance(tag, str) else tag[1]
     
+    def iter_paragraphs(self, doc_file):
+        # Yields every paragraph in the document body as soon as it has been read, then frees it.
+        # Paragraphs nested inside another paragraph, e.g. in text boxes, are yielded after the
+        # outer paragraph, in document order
+        elements = []
+        body_depth = -1
+        p_depth = -1
+        
+        for event, element in iterparse(doc_file, events=('start', 'end')):
+            if event == 'start':
+                elements.append(element)
+                if element.tag == W_BODY and body_depth == -1:
+                    body_depth = len(elements)
+                    self.found_body = True
+                elif element.tag == W_P and body_depth != -1 and p_depth == -1:
+                    p_depth = len(elements)
+                continue
+            
+            depth = len(elements)
+            elements.pop()
+            
+            if depth == p_depth:
+                p_depth = -1
+                yield from element.iter(W_P)
+                element.clear()
+                elements[-1].remove(element)
+            elif depth == body_depth:
+                body_depth = -1
+            pass
+    
     @staticmethod
-    def get_text(tag: Tag):
+    def get_text(tag):
         output = []
         
-        for r in tag.find_all('w:r'):
-            for child in r.contents:
-                if child.name == 't':
-                    output.append(str(child.string))
-                elif child.name == 'br':
+        for r in tag.iter(W_R):
+            for child in r:
+                child_name = local_name(child)
+                if child_name == 't':
+                    output.append(str(child.text))
+                elif child_name == 'br':
                     output.append('\n')
-                elif child.name == 'tab':
+                elif child_name == 'tab':
                     output.append('\t')
         
         return ''.join(output)
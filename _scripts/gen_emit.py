@@ -0,0 +1,169 @@
+"""
+Turns an article's content text and its merged tag stream into the article html and the nested
+run lists used by the per-article JSON and the WeChat export, in a single forward pass over the
+tags, so the outputs are always built from exactly the same tags.
+"""
+from typing import List, Optional
+
+INLINE_TAGS = {'br', '/li', '/p', 'span', '/span', '/b', '/strong', 'strong'}
+BLOCK_TAGS = {'ul', '/ul', 'ol', '/ol'}
+# Marks the start of a list item in the JSON content
+LIST_ITEM_DATA = (chr(2),)
+
+
+class ContentEmitter:
+    output_child: Optional[List]
+    output_paragraph: Optional[List]
+    output_parent: Optional[List]
+
+    def __init__(self, content_indent=''):
+        self.content_indent = content_indent
+
+        self.html_output = []
+        self.json_output = []
+        self.text_buffer = []
+        self.output_paragraph = None
+        self.output_parent = None
+        self.output_child = None
+        pass
+
+    def emit(self, content_text, content_tags):
+        # Returns the html and the JSON content for the tagged text
+        self.reset()
+        content_indent = self.content_indent
+        html_output = self.html_output
+        indent = ''
+        # Text before the first tag is not included in the html. Text after the last tag is added
+        # once every tag has been emitted
+        html_end = None
+        json_end = 0
+        # The data of a highlighted word, whose run is ended by the next tag
+        span_data = None
+
+        for index, tag_name, attribs, data in content_tags:
+            # Html
+            if html_end is not None and html_end != index:
+                html_output.append(content_text[html_end:index])
+            html_end = index
+
+            is_block = tag_name in BLOCK_TAGS
+            is_closing = tag_name[0] == '/'
+            if is_block and is_closing:
+                indent = indent[:-1]
+
+            pre_whitespace = ''
+            if index != 0 and tag_name not in INLINE_TAGS:
+                if is_block and is_closing:
+                    pre_whitespace += '\n'
+                pre_whitespace += f'{content_indent}{indent}'
+
+            if is_block:
+                post_whitespace = '\n'
+            elif tag_name == 'br':
+                post_whitespace = f'\n{content_indent}{indent}\t'
+            else:
+                post_whitespace = ''
+
+            if attribs:
+                attribs = f' {attribs.lstrip()}'
+
+            html_output.append(f'{pre_whitespace}<{tag_name}{attribs}>{post_whitespace}')
+
+            if is_block and not is_closing:
+                indent += '\t'
+
+            # JSON
+            if span_data is not None:
+                run = [content_text[json_end:index]]
+                if 'word_lists' in span_data and span_data['word_lists']:
+                    run.append(' '.join(span_data['word_lists']))
+                if 'lemma' in span_data:
+                    run.append(span_data['lemma'])
+                self.push_data(run)
+                json_end = index
+                span_data = None
+                continue
+
+            if json_end != index:
+                self.push_text(content_text[json_end:index])
+                json_end = index
+
+            if tag_name == 'p':
+                self.new_paragraph()
+                continue
+
+            if tag_name == 'br':
+                self.push_text('\n')
+            if tag_name == 'ul':
+                self.new_paragraph()
+            if tag_name == '/ul':
+                self.new_paragraph()
+            if tag_name == 'li':
+                self.push_data(LIST_ITEM_DATA)
+            elif tag_name == 'span':
+                self.flush_text()
+                span_data = data
+            pass
+
+        if html_end is not None and html_end != len(content_text):
+            html_output.append(content_text[html_end:])
+        self.flush_text()
+
+        return ''.join(html_output), self.json_output
+
+    def reset(self):
+        self.html_output = []
+        self.json_output = []
+        self.text_buffer = []
+        self.output_paragraph = None
+        self.output_parent = None
+        self.output_child = None
+        pass
+
+    def push_text(self, text):
+        self.text_buffer.append(text)
+        pass
+
+    def push_data(self, data):
+        self.flush_text()
+
+        self.ensure_para()
+        self.output_parent.append(data)
+        pass
+
+    def new_paragraph(self):
+        self.flush_text()
+        self.pop_child()
+        self.output_paragraph = None
+        self.output_parent = None
+        pass
+
+    def flush_text(self):
+        if not self.text_buffer:
+            return
+
+        self.ensure_para()
+        self.output_parent.append([''.join(self.text_buffer)])
+        self.text_buffer.clear()
+        pass
+
+    def ensure_para(self):
+        if self.output_parent is None:
+            self.output_paragraph = []
+            self.output_parent = self.output_paragraph
+            self.json_output.append(self.output_parent)
+
+    def push_child(self):
+        self.ensure_para()
+        self.output_child = []
+        self.output_parent.append(self.output_child)
+        self.output_parent = self.output_child
+
+    def pop_child(self):
+        if self.output_child is None:
+            return
+
+        self.output_parent = self.output_paragraph
+        self.output_child = None
+
+    pass
@@ -0,0 +1,127 @@
+"""
+Collects the changes to the shared index files during a build, and writes each changed file once
+at the end.
+Every file is written with write_atomic, so a file is never left half written.
+"""
+import json
+import re
+from pathlib import Path
+
+from atomic_file import write_atomic
+
+ARTICLE_INDEX_LIST_END_REGEX = re.compile(r'([ \t]*)(<!-- __LIST_END__ -->)')
+
+
+class IndexWriter:
+    def __init__(self, index_file: Path, article_index_file: Path, json_index_file: Path):
+        self.index_file = index_file
+        self.article_index_file = article_index_file
+        self.json_index_file = json_index_file
+
+        self.index = None
+        self.last_file = None
+        self.index_changed = False
+        self.new_articles = []
+        # Loaded on first use
+        self.json_data = None
+        self.json_new_entries = []
+        self.json_slugs = dict()
+        self.json_changed = False
+        pass
+
+    def set_index(self, index, last_file):
+        if index != self.index or last_file != self.last_file:
+            self.index = index
+            self.last_file = last_file
+            self.index_changed = True
+        pass
+
+    def add_article(self, output_name, title):
+        # Adds a link to the article at the end of the article index list
+        self.new_articles.append((output_name, title))
+        pass
+
+    def load_json_index(self):
+        if not self.json_index_file.exists():
+            self.json_data = dict(articles=[])
+        else:
+            with self.json_index_file.open('r', encoding='utf-8') as f:
+                self.json_data = json.load(f)
+
+        # Each slug maps to the list its entry is in, and its position in that list
+        articles = self.json_data['articles']
+        for i, article_data in enumerate(articles):
+            slug = article_data[0] if isinstance(article_data, list) else article_data['slug']
+            if slug not in self.json_slugs:
+                self.json_slugs[slug] = (articles, i)
+        pass
+
+    def add_json(self, base_name, props):
+        # Updates the entry for the article, or adds a new one to the start of the JSON index
+        if self.json_data is None:
+            self.load_json_index()
+
+        new_data = dict(
+            slug=base_name,
+            title=props['title'],
+            difficulty=props['difficulty'],
+            wordCount=props['word_count'],
+            date=props['date']
+        )
+
+        if base_name in self.json_slugs:
+            entries, i = self.json_slugs[base_name]
+            entries[i] = new_data
+        else:
+            self.json_slugs[base_name] = (self.json_new_entries, len(self.json_new_entries))
+            self.json_new_entries.append(new_data)
+
+        self.json_changed = True
+        pass
+
+    def changed(self):
+        # Whether any changes haven't been written yet, e.g. because flush failed
+        return self.json_changed or bool(self.new_articles) or self.index_changed
+
+    def flush(self):
+        if self.json_changed:
+            # The newest articles are listed first
+            self.json_data['articles'][:0] = reversed(self.json_new_entries)
+            write_atomic(self.json_index_file, json.dumps(self.json_data, indent='\t'))
+            self.json_new_entries = []
+            self.json_data = None
+            self.json_slugs = dict()
+            self.json_changed = False
+
+        if self.new_articles:
+            self.flush_article_index()
+            self.new_articles = []
+
+        if self.index_changed:
+            write_atomic(self.index_file, '\n'.join([str(self.index), self.last_file]))
+            self.index_changed = False
+        pass
+
+    def flush_article_index(self):
+        if not self.article_index_file.exists():
+            print(f'Article index file not found "{self.article_index_file.name}"')
+            return
+
+        with self.article_index_file.open('r', encoding='utf-8') as f:
+            text = f.read()
+
+        m = ARTICLE_INDEX_LIST_END_REGEX.search(text)
+        if not m:
+            print('Cannot find list end in article index')
+            return
+
+        indent = m.group(1)
+        new_items = [f'{indent}<li><a href="{output_name}.html">{title}</a></li>\n'
+                     for output_name, title in self.new_articles]
+        start, end = m.start(), m.end()
+        text = text[:start] + ''.join(new_items) + f'{indent}{m.group(2)}' + text[end:]
+
+        write_atomic(self.article_index_file, text)
+        pass
+
+    pass
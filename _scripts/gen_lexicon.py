@@ -0,0 +1,342 @@
+"""
+Requirements:
+    - pip install spacy (See full installation instructions: https://spacy.io/usage)
+    - numpy, which is installed with spacy
+"""
+import re
+from pathlib import Path
+
+import numpy as np
+from spacy.attrs import IDX, LEMMA, LENGTH, LOWER, ORTH, SPACY
+from spacy.strings import get_string_id
+
+TERM_SPLIT_REGEX = re.compile(r'[-–\s]+')
+HYPEN_REGEX = re.compile(r'^[-–]+$')
+# Marks the end of a term in a trie node
+TERM_END = None
+# The word lists and their frequency tiers, in the order their classes are output
+# LIST_TYPES = ('ielts', 'cet4', 'cet6')
+LIST_TYPES = (
+    ('ielts', ('low', 'med', 'high')),
+    ('cet6', ('low', 'med', 'high')),
+    ('extra', ('', )),
+)
+# One bit for each list and frequency, and one for words in the article's dictionary
+LIST_BITS = dict()
+for _list_type, _freqs in LIST_TYPES + (('def', ('', )), ):
+    for _freq in _freqs:
+        LIST_BITS[(_list_type, _freq)] = 1 << len(LIST_BITS)
+DEF_BIT = LIST_BITS[('def', '')]
+# Shared by all closing tags, which have no data
+CLOSE_TAG_DATA = dict()
+
+
+class TermMatcher:
+    """
+    Finds the longest multi-word term from the word lists starting at a token in a single
+    forward pass.
+    Terms are joined with spaces if there is any whitespace between their tokens, or with
+    hyphens otherwise. Hyphen tokens are skipped until whitespace is found, so "well-known" and
+    "look after" are both matched.
+    Each term is stored in a trie of its parts for both delimiters. Tokens are split on the same
+    delimiter while walking, so a path through a trie only matches if joining the tokens gives
+    exactly the term.
+    """
+
+    def __init__(self, terms, max_terms):
+        self.max_terms = max_terms
+        self.tries = {' ': dict(), '-': dict()}
+
+        for term in terms:
+            for delimiter, trie in self.tries.items():
+                parts = term.split(delimiter)
+                if len(parts) > 1:
+                    TermMatcher.add(trie, parts, term)
+        pass
+
+    @staticmethod
+    def add(node, parts, term):
+        for part in parts:
+            if part not in node:
+                node[part] = dict()
+            node = node[part]
+        node[TERM_END] = term
+        pass
+
+    @staticmethod
+    def walk(node, text, delimiter):
+        if node is None:
+            return None
+        for part in text.split(delimiter):
+            node = node.get(part)
+            if node is None:
+                return None
+        return node
+
+    def starts_term(self, text):
+        return text.split(' ')[0] in self.tries[' '] or text.split('-')[0] in self.tries['-']
+
+    def match(self, texts, spaces, start):
+        # Returns the index of the last token and the term for the longest term starting at
+        # `start`, or None. `texts` are the lower case token texts, and `spaces` whether each
+        # token is followed by whitespace
+        text = texts[start]
+        space_node = TermMatcher.walk(self.tries[' '], text, ' ')
+        hyphen_node = TermMatcher.walk(self.tries['-'], text, '-')
+        has_whitespace = spaces[start]
+        num_tokens = len(texts)
+        num_terms = 1
+        match = None
+
+        j = start + 1
+        while j < num_tokens and num_terms < self.max_terms:
+            if space_node is None and hyphen_node is None:
+                break
+
+            text = texts[j]
+            require_whitespace = has_whitespace
+            if spaces[j]:
+                has_whitespace = True
+            # Don't allow whitespace between hyphens
+            if not has_whitespace and HYPEN_REGEX.match(text):
+                j += 1
+                continue
+
+            num_terms += 1
+            space_node = TermMatcher.walk(space_node, text, ' ')
+            if require_whitespace:
+                hyphen_node = None
+            else:
+                hyphen_node = TermMatcher.walk(hyphen_node, text, '-')
+
+            node = space_node if require_whitespace else hyphen_node
+            if node is not None and TERM_END in node:
+                match = (j, node[TERM_END])
+            j += 1
+
+        return match
+
+    pass
+
+
+class HashedTexts:
+    """
+    Token texts looked up from their string hashes only when they are needed.
+    """
+
+    def __init__(self, strings, hashes):
+        self.strings = strings
+        self.hashes = hashes
+        pass
+
+    def __getitem__(self, index):
+        return self.strings[int(self.hashes[index])]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    pass
+
+
+class Lexicon:
+    """
+    The combined word lists, used to highlight the words in an article.
+    Each term is stored as a bitmask of the word lists and frequency tiers it is in, and the
+    class attribute and JSON word lists for each distinct mask are only built once.
+    Tokens are matched against the word lists by their spaCy string hashes using NumPy, so only
+    the few tokens that are in a word list or dictionary, or that could start a multi-word term,
+    are looked at in Python.
+    """
+
+    def __init__(self):
+        self.words = dict()
+        self.longest_term = 1
+        self.term_matcher = None
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.masks = np.empty(0, dtype=np.int64)
+        self.word_classes = dict()
+        pass
+
+    def load(self, path: Path):
+        self.words = dict()
+        self.longest_term = 1
+
+        for list_type, freqs in LIST_TYPES:
+            for freq in freqs:
+                bit = LIST_BITS[(list_type, freq)]
+                freq_str = f'-{freq}' if freq else ''
+                with (path / f'words-{list_type}{freq_str}.txt').open('r', encoding='utf-8') as f:
+                    for word in f.read().splitlines():
+                        word = word.strip()
+                        word_count = len(TERM_SPLIT_REGEX.split(word))
+                        if word_count > self.longest_term:
+                            self.longest_term = word_count
+
+                        self.words[word] = self.words.get(word, 0) | bit
+
+        self.term_matcher = TermMatcher(self.words.keys(), self.longest_term)
+
+        hashes = Lexicon.hash_strings_ordered(list(self.words.keys()))
+        order = np.argsort(hashes)
+        self.hashes = hashes[order]
+        self.masks = np.fromiter(self.words.values(), dtype=np.int64, count=len(self.words))[order]
+        pass
+
+    def word_class(self, mask):
+        # Returns the class attribute, the tag attributes and the JSON data for a word list mask
+        if mask in self.word_classes:
+            return self.word_classes[mask]
+
+        list_types = []
+        freq_list = []
+        for (list_type, freq), bit in LIST_BITS.items():
+            if not mask & bit:
+                continue
+            if list_type not in list_types:
+                list_types.append(list_type)
+            if freq:
+                freq_list.append(f'{list_type}-{freq}')
+
+        word_lists = ' '.join(list_types)
+        freqs = (' ' + ' '.join(freq_list)).rstrip()
+        class_attr = f'class="word {word_lists}{freqs}"'
+        word_class = (
+            class_attr,
+            f'{class_attr} tabindex="-1"',
+            dict(word_lists=tuple(list_types + freq_list)),
+        )
+        self.word_classes[mask] = word_class
+        return word_class
+
+    @staticmethod
+    def hash_strings(strings):
+        return np.unique(np.fromiter((get_string_id(text) for text in strings), dtype=np.uint64))
+
+    @staticmethod
+    def hash_strings_ordered(strings):
+        return np.fromiter((get_string_id(text) for text in strings), dtype=np.uint64,
+                           count=len(strings))
+
+    @staticmethod
+    def search(sorted_hashes, hashes):
+        # Returns the position of each hash in sorted_hashes, and whether it was found
+        if not len(sorted_hashes):
+            return np.zeros(len(hashes), dtype=np.intp), np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(sorted_hashes, hashes)
+        np.minimum(positions, len(sorted_hashes) - 1, out=positions)
+        return positions, sorted_hashes[positions] == hashes
+
+    @staticmethod
+    def contains(sorted_hashes, hashes):
+        return Lexicon.search(sorted_hashes, hashes)[1]
+
+    def lookup(self, hashes):
+        # Returns the word list mask for each hash, or 0 if it isn't in the word lists
+        positions, found = Lexicon.search(self.hashes, hashes)
+        return np.where(found, self.masks[positions], 0)
+
+    def highlight(self, doc, content_tags, token_properties, dictionary, ignore_words):
+        # Returns content_tags with a span added around every highlighted word
+        tokens = doc.to_array([ORTH, LOWER, LEMMA, IDX, LENGTH, SPACY])
+        if not len(tokens):
+            return content_tags
+
+        strings = doc.vocab.strings
+        orths, lowers, lemmas, indices, lengths, spaces = tokens.T
+
+        # Lemmas are compared in lower case. There are far fewer distinct lemmas than tokens
+        unique_lemmas, lemma_inverse = np.unique(lemmas, return_inverse=True)
+        lemma_texts = [strings[int(lemma)].lower() for lemma in unique_lemmas]
+        lemmas = Lexicon.hash_strings_ordered(lemma_texts)[lemma_inverse]
+
+        word_masks = self.lookup(orths)
+        lemma_masks = self.lookup(lemmas)
+        dictionary_hashes = Lexicon.hash_strings(dictionary.keys())
+        word_defs = Lexicon.contains(dictionary_hashes, orths)
+        lemma_defs = Lexicon.contains(dictionary_hashes, lemmas)
+        ignored = np.isin(lowers, Lexicon.hash_strings(ignore_words))
+
+        term_starts = [lower for lower in np.unique(lowers)
+                       if self.term_matcher.starts_term(strings[int(lower)])]
+        term_starts = np.isin(lowers, np.array(term_starts, dtype=np.uint64))
+
+        candidates = (word_masks != 0) | (lemma_masks != 0) | word_defs | lemma_defs
+        candidates &= ~ignored
+        candidates |= term_starts
+
+        texts = HashedTexts(strings, lowers)
+        combined_tags = []
+        content_tags_index = 0
+        next_index = 0
+
+        for i in np.flatnonzero(candidates).tolist():
+            # Skip tokens that are part of a multi-word term
+            if i < next_index:
+                continue
+            next_index = i + 1
+            token_index = int(indices[i])
+
+            # Find multi-word terms in the dictionary
+            term = self.term_matcher.match(texts, spaces, i) if term_starts[i] else None
+            if term is not None:
+                end_index, lemma = term
+                next_index = end_index + 1
+                length = len(lemma)
+                is_ignored = lemma in ignore_words
+                word_mask = self.words[lemma]
+                lemma_mask = word_mask
+                word_def = lemma_def = lemma in dictionary
+            else:
+                lemma = None
+                length = int(lengths[i])
+                is_ignored = ignored[i]
+                word_mask = int(word_masks[i])
+                lemma_mask = int(lemma_masks[i])
+                word_def = word_defs[i]
+                lemma_def = lemma_defs[i]
+
+            if is_ignored or token_index in token_properties and \
+                    'ignore' in token_properties[token_index]:
+                continue
+
+            mask = 0
+            use_lemma = False
+            if word_mask:
+                mask = word_mask
+            elif lemma_mask:
+                mask = lemma_mask
+                use_lemma = True
+
+            if word_def or lemma_def:
+                mask |= DEF_BIT
+                if not word_def:
+                    use_lemma = True
+
+            if not mask:
+                continue
+
+            class_attr, attribs, data = self.word_class(mask)
+            if use_lemma:
+                if lemma is None:
+                    lemma = lemma_texts[lemma_inverse[i]]
+                attribs = f'{class_attr} data-lemma="{lemma}" tabindex="-1"'
+                data = dict(word_lists=data['word_lists'], lemma=lemma)
+
+            while content_tags_index < len(content_tags):
+                tag_data = content_tags[content_tags_index]
+                tag_index = tag_data[0]
+                if tag_index > token_index:
+                    break
+                combined_tags.append(tag_data)
+                content_tags_index += 1
+                pass
+
+            combined_tags.append((token_index, 'span', attribs, data))
+            combined_tags.append((token_index + length, '/span', '', CLOSE_TAG_DATA))
+
+        if content_tags_index < len(content_tags):
+            combined_tags += content_tags[content_tags_index:]
+
+        return combined_tags
+
+    pass
@@ -0,0 +1,177 @@
+"""
+Compiles _template.html into literal text and placeholders once, so rendering an article is a
+single join instead of a str.replace pass over the whole page for every property.
+Compiled templates are cached by a hash of the template text, in memory and on disk.
+"""
+import hashlib
+import pickle
+import re
+from pathlib import Path
+from typing import List
+
+from atomic_file import write_atomic
+
+PLACEHOLDER_REGEX = re.compile(r'__([A-Z0-9][A-Z0-9_]*?)__')
+CONTENT_INDENT_REGEX = re.compile(r'^(\s*).*__CONTENT__', re.MULTILINE)
+# Increase when the compiled format changes, so cached templates are compiled again
+COMPILER_VERSION = 1
+
+compiled_templates = dict()
+
+
+class Template:
+    literals: List[str]
+    names: List[str]
+
+    def __init__(self, text):
+        self.literals = []
+        self.names = []
+
+        end = 0
+        for m in PLACEHOLDER_REGEX.finditer(text):
+            self.literals.append(text[end:m.start()])
+            self.names.append(m.group(1))
+            end = m.end()
+        self.literals.append(text[end:])
+        pass
+
+    def render(self, *values):
+        # Placeholders are looked up in each of the value dicts in order. Unknown placeholders
+        # are left in place
+        literals = self.literals
+        output = [literals[0]]
+
+        for i, name in enumerate(self.names):
+            for value_map in values:
+                if name in value_map:
+                    output.append(value_map[name])
+                    break
+            else:
+                output.append(f'__{name}__')
+            output.append(literals[i + 1])
+
+        return ''.join(output)
+
+    pass
+
+
+class ListTemplate:
+    container_marker: str
+    indent: str
+    tpl: Template
+    item_indent: str
+    item_tpl: Template
+
+    def fetch(self, tpl_data, container_marker, item_marker):
+        self.container_marker = container_marker
+        container_regex = re.compile(r'(\t*)__\[M__(.+)__M]__\n*'.replace('M', container_marker), re.DOTALL)
+        item_regex = re.compile(r'(\t+)__\[M__(.+)__M]__'.replace('M', item_marker), re.DOTALL)
+
+        m = container_regex.search(tpl_data)
+        if not m:
+            return None
+
+        tpl_start = tpl_data[:m.start()]
+        tpl_end = tpl_data[m.end():]
+        self.indent = m.group(1)
+        tpl = self.indent + m.group(2)
+        im = item_regex.search(tpl)
+        if not im:
+            print('Invalid item template')
+            return None
+
+        item_tpl_start = tpl[:im.start()]
+        item_tpl_end = tpl[im.end():]
+        self.item_indent = im.group(1)
+        self.item_tpl = Template(im.group(2))
+
+        self.tpl = Template(f'{item_tpl_start}__CONTENT__{item_tpl_end}\n')
+
+        return f'{tpl_start}__{self.marker()}__{tpl_end}'
+
+    def marker(self):
+        return f'LIST_{self.container_marker}'
+
+    def render(self, keys, data, values):
+        # Item values take precedence over the page values, and the items replace the content
+        # of the container
+        items = [self.item_tpl.render(dict(zip(keys, item)), values) for item in data]
+
+        if not items:
+            return ''
+
+        return self.tpl.render(dict(CONTENT='\n'.join(items)), values)
+
+    pass
+
+
+class ArticleTemplate:
+    content_indent: str
+    page: Template
+    questions: ListTemplate
+    difficult_words: ListTemplate
+
+    @staticmethod
+    def compile(tpl_data):
+        template = ArticleTemplate()
+
+        # Find content indentation
+        m = CONTENT_INDENT_REGEX.search(tpl_data)
+        template.content_indent = m.group(1) if m else ''
+
+        template.questions = ListTemplate()
+        tpl_data = template.questions.fetch(tpl_data, 'QUESTIONS', 'QUESTION')
+        if tpl_data is None:
+            print('Could not find questions section template')
+            return None
+
+        template.difficult_words = ListTemplate()
+        tpl_data = template.difficult_words.fetch(tpl_data, 'DIFFICULT_WORDS', 'ITEM')
+        if tpl_data is None:
+            print('Could not find difficult words section template')
+            return None
+
+        template.page = Template(tpl_data)
+        return template
+
+    @staticmethod
+    def load(path: Path, cache_file: Path = None):
+        with path.open('r', encoding='utf-8') as f:
+            tpl_data = f.read()
+
+        key = hashlib.sha1(f'{COMPILER_VERSION}\n{tpl_data}'.encode('utf-8')).hexdigest()
+        if key in compiled_templates:
+            return compiled_templates[key]
+
+        template = None
+        if cache_file is not None and cache_file.exists():
+            try:
+                with cache_file.open('rb') as f:
+                    cached_key, cached_template = pickle.load(f)
+                if cached_key == key:
+                    template = cached_template
+            except Exception:
+                pass
+
+        if template is None:
+            template = ArticleTemplate.compile(tpl_data)
+            if template is None:
+                return None
+
+            # Worker processes can compile the template at the same time
+            if cache_file is not None:
+                write_atomic(cache_file, pickle.dumps((key, template)))
+
+        compiled_templates[key] = template
+        return template
+
+    def render(self, props, questions, difficult_words):
+        values = {key.upper(): str(value) for key, value in props.items()}
+        values[self.questions.marker()] = self.questions.render(
+            ('QUESTION', 'ANSWER'), questions, values)
+        values[self.difficult_words.marker()] = self.difficult_words.render(
+            ('WORD', 'DEF'), difficult_words, values)
+
+        return self.page.render(values)
+
+    pass
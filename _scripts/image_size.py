@@ -0,0 +1,121 @@
+"""
+Reads the width and height of images from their headers, without decoding them.
+JPEG, PNG and GIF headers are read directly, and Pillow is only used for other formats.
+Sizes are cached between runs by path, modification time and file size.
+
+Requirements:
+    - pip install Pillow (Only for formats other than JPEG, PNG and GIF)
+"""
+import json
+import os
+import struct
+from pathlib import Path
+
+from atomic_file import write_atomic
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Start of frame markers, which hold the image size. C4, C8 and CC are other markers
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers without a length
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+def read_jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        # Skip fill bytes before the marker
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+
+        marker = byte[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9:
+            return None
+
+        data = f.read(2)
+        if len(data) != 2:
+            return None
+        length, = struct.unpack('>H', data)
+
+        if marker in JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) != 5:
+                return None
+            height, width = struct.unpack('>xHH', data)
+            return width, height
+
+        f.seek(length - 2, os.SEEK_CUR)
+        # Every segment is followed by another marker
+        if f.read(1) != b'\xff':
+            return None
+
+
+def probe_size(path: Path):
+    # Returns (width, height) from the image header, or None if the format isn't known
+    with path.open('rb') as f:
+        header = f.read(26)
+
+        if header.startswith(b'\xff\xd8'):
+            return read_jpeg_size(f)
+        if header.startswith(PNG_SIGNATURE) and header[12:16] == b'IHDR':
+            return struct.unpack('>II', header[16:24])
+        if header[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', header[6:10])
+
+    return None
+
+
+def image_size(path: Path):
+    size = probe_size(path)
+    if size is not None:
+        return size
+
+    from PIL import Image
+    with Image.open(path) as img:
+        return img.size
+
+
+class ImageSizeCache:
+    def __init__(self, path: Path):
+        self.path = path
+        self.sizes = dict()
+        self.changed = False
+
+        if path.exists():
+            try:
+                with path.open('r', encoding='utf-8') as f:
+                    self.sizes = json.load(f)
+            except (OSError, ValueError):
+                print(f'Unable to read image size cache "{str(path)}"')
+        pass
+
+    def get(self, path: Path):
+        key = str(path)
+        stat = path.stat()
+
+        entry = self.sizes.get(key)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2], entry[3]
+
+        width, height = image_size(path)
+        self.sizes[key] = [stat.st_mtime_ns, stat.st_size, width, height]
+        self.changed = True
+        return width, height
+
+    def save(self):
+        if not self.changed:
+            return
+
+        # Forget about images that no longer exist
+        self.sizes = {key: value for key, value in self.sizes.items() if Path(key).exists()}
+
+        write_atomic(self.path, json.dumps(self.sizes, indent='\t'))
+        self.changed = False
+        pass
+
+    pass
@@ -0,0 +1,64 @@
+"""
+A cache of parsed .docx documents, shared by every script that uses DocParser.
+Entries are keyed by the CRC32 and size of word/document.xml, which are read from the zip
+directory without decompressing anything, and the version of the parser. A document is only
+parsed again when its text changes or the parser is updated.
+The cache is limited in size, and the least recently used entries are removed first, so entries
+for deleted or changed documents, and for older versions of the parser, don't build up.
+"""
+import os
+import pickle
+from pathlib import Path
+from zipfile import ZipFile
+
+from atomic_file import write_atomic
+from cache_eviction import evict_least_recently_used
+
+DEFAULT_MAX_SIZE = 16 * 1024 * 1024
+# Entries are removed on the first write of each process, then after every EVICT_INTERVAL writes,
+# since every script that parses documents writes to the cache
+EVICT_INTERVAL = 64
+
+
+class ParseCache:
+    def __init__(self, path: Path, version, max_size=DEFAULT_MAX_SIZE):
+        self.path = path
+        self.version = version
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        pass
+
+    def entry_path(self, zip_file: ZipFile, name):
+        info = zip_file.getinfo(name)
+        return self.path / f'v{self.version}-{info.CRC:08x}-{info.file_size}.pickle'
+
+    def get(self, zip_file: ZipFile, name):
+        try:
+            path = self.entry_path(zip_file, name)
+            with path.open('rb') as f:
+                result = pickle.load(f)
+            # Mark as recently used
+            os.utime(path)
+        except (OSError, KeyError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return result
+
+    def put(self, zip_file: ZipFile, name, result):
+        self.path.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.entry_path(zip_file, name),
+                     pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+        if self.puts % EVICT_INTERVAL == 0:
+            self.evict()
+        self.puts += 1
+        pass
+
+    def evict(self):
+        return evict_least_recently_used(self.path, '*.pickle', self.max_size)
+
+    pass
@@ -0,0 +1,153 @@
+"""
+Records how long each stage of a build takes, as nested spans.
+Each span records its wall time, CPU time and peak traced memory. Spans inside an article's span
+are attributed to that article.
+The spans can be written as a per-article JSON report, and as a Chrome trace_event file, which
+can be opened in Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+
+Spans cost almost nothing while the profiler is disabled, which it is unless gen.py is run
+with --profile.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+# Python 3.9+ can reset the peak, so each span measures its own peak. Before that, a span's peak
+# includes anything allocated earlier in the run that has since been freed
+CAN_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.events = []
+        self.stack = []
+        pass
+
+    def enable(self, trace_memory=True):
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        pass
+
+    @contextmanager
+    def span(self, name, article=None):
+        if not self.enabled:
+            yield
+            return
+
+        stack = self.stack
+        if article is None and stack:
+            article = stack[-1]['article']
+
+        entry = dict(article=article, child_peak=0, memory=0, peak_before=0)
+        if self.trace_memory:
+            entry['memory'], entry['peak_before'] = tracemalloc.get_traced_memory()
+            if CAN_RESET_PEAK:
+                tracemalloc.reset_peak()
+        stack.append(entry)
+
+        start_time = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_time
+            cpu = time.process_time() - start_cpu
+            stack.pop()
+
+            peak = 0
+            if self.trace_memory:
+                _, peak_end = tracemalloc.get_traced_memory()
+                peak_end = max(peak_end, entry['child_peak'])
+                peak = max(peak_end - entry['memory'], 0)
+                # Resetting the peak for this span lost the peak the enclosing span had seen
+                if stack:
+                    stack[-1]['child_peak'] = max(stack[-1]['child_peak'], peak_end,
+                                                  entry['peak_before'])
+
+            self.events.append(dict(
+                name=name,
+                article=article,
+                start=start_time,
+                wall=wall,
+                cpu=cpu,
+                peak=peak,
+                pid=os.getpid(),
+                tid=threading.get_ident(),
+            ))
+        pass
+
+    def drain(self):
+        # Returns and forgets the recorded spans, e.g. to send them from a worker process
+        events = self.events
+        self.events = []
+        return events
+
+    def article_report(self):
+        # Totals for each stage of each article
+        report = dict()
+        for event in self.events:
+            if event['article'] is None:
+                continue
+            stages = report.setdefault(event['article'], dict())
+            stage = stages.setdefault(event['name'], dict(count=0, wall=0.0, cpu=0.0, peak=0))
+            stage['count'] += 1
+            stage['wall'] += event['wall']
+            stage['cpu'] += event['cpu']
+            stage['peak'] = max(stage['peak'], event['peak'])
+        return report
+
+    def chrome_trace(self):
+        trace_events = []
+        for event in self.events:
+            args = dict(cpu_ms=round(event['cpu'] * 1000, 3), peak_bytes=event['peak'])
+            if event['article'] is not None:
+                args['article'] = event['article']
+            trace_events.append(dict(
+                name=event['name'],
+                cat='article' if event['article'] is not None else 'build',
+                ph='X',
+                ts=round(event['start'] * 1e6, 3),
+                dur=round(event['wall'] * 1e6, 3),
+                pid=event['pid'],
+                tid=event['tid'],
+                args=args,
+            ))
+        return dict(traceEvents=trace_events, displayTimeUnit='ms')
+
+    def summary(self):
+        stages = dict()
+        for event in self.events:
+            stage = stages.setdefault(event['name'], [0, 0.0, 0.0, 0])
+            stage[0] += 1
+            stage[1] += event['wall']
+            stage[2] += event['cpu']
+            stage[3] = max(stage[3], event['peak'])
+
+        lines = [f'{"Stage":<24}{"Count":>7}{"Wall ms":>11}{"CPU ms":>11}{"Avg ms":>10}'
+                 f'{"Peak KB":>10}']
+        for name, (count, wall, cpu, peak) in sorted(stages.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{name:<24}{count:>7}{wall * 1000:>11.1f}{cpu * 1000:>11.1f}'
+                         f'{wall / count * 1000:>10.2f}{peak / 1024:>10.0f}')
+        return '\n'.join(lines)
+
+    def save(self, path: Path):
+        path.mkdir(parents=True, exist_ok=True)
+        with (path / 'report.json').open('w', encoding='utf-8') as f:
+            json.dump(self.article_report(), f, indent='\t')
+        with (path / 'trace.json').open('w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+        pass
+
+    pass
+
+
+profiler = Profiler()
+span = profiler.span
@@ -0,0 +1,178 @@
+"""
+Counts the characters, words, sentences, syllables, polysyllabic words and words not on the
+Dale-Chall list of a text in a single pass over its words, and derives every readability score
+from those counts.
+Text is cleaned and split into words the same way as Textatistic, and syllables are counted with
+the same hyphenation dictionary, so every count except the Dale-Chall count matches it. Dale-Chall
+words are looked up in a frozenset of data/dale_chall_word_list.txt, instead of searching a list
+for every word. Syllable counts are looked up in the shared SyllableMemo before hyphenating.
+
+Requirements:
+    - pip install PyHyphen (The en_US dictionary is downloaded the first time it is used)
+"""
+import re
+from pathlib import Path
+
+from syllable_memo import WORD_TRANSLATION, SyllableMemo
+
+# Next to the module, so it is found from any working directory
+DALE_CHALL_FILE = Path(__file__).resolve().parent / 'data' / 'dale_chall_word_list.txt'
+
+# Replaced before counting, in order
+CLEAN_REPLACEMENTS = (
+    ('–', '-'),
+    ('—', '-'),
+    # Hyphenated single words, e.g. co-author
+    ('co-', 'co'),
+    ('Co-', 'Co'),
+)
+CLEAN_REGEXES = (
+    # Decimal points aren't sentence ends
+    (re.compile(r'\.([0-9])'), r'+\1'),
+    # Punctuation used mid-sentence
+    (re.compile(r'[?!]+\)[.?!]+'), ').'),
+    (re.compile(r'[?!]+\)\s*-+'), ') -'),
+)
+# Abbreviations are replaced by their full text, so their periods aren't sentence ends
+ABBREVIATIONS = (
+    ('i.e.', 'id est'),
+    ('i. e.', 'id est'),
+    ('e.g.', 'exempli gratia'),
+    ('e. g.', 'exempli gratia'),
+    ('i.i.d.', 'independently and identically distributed'),
+    ('et al.', 'et alii'),
+    ('etc.', 'etcetera'),
+    ('St.', 'Saint'),
+    ('U.S.', 'United States'),
+    ('U. S.', 'United States'),
+    ('U.K.', 'United Kingdom'),
+    ('U. K.', 'United Kingdom'),
+    ('U.N.', 'United Nations'),
+    ('U. N.', 'United Nations'),
+    ('Roe v. Wade', 'Roe versus Wade'),
+    ('Inc.', 'Incorporated'),
+    ('Sec.', 'Section'),
+    ('Vol.', 'Volume'),
+    ('cf.', 'confer'),
+    (' pp.', ' pages'),
+    (' ff.', ' folio'),
+    ('Dr.', 'Doctor'),
+    ('viz.', 'videlicet'),
+)
+SENTENCE_ENDS = ('.', '!', '?')
+POLYSYLLABLE_COUNT = 3
+
+_easy_words = None
+
+
+def easy_words():
+    # The Dale-Chall list, loaded on first use
+    global _easy_words
+    if _easy_words is None:
+        with DALE_CHALL_FILE.open('r', encoding='utf-8') as f:
+            _easy_words = frozenset(word.strip().lower() for word in f if word.strip())
+    return _easy_words
+
+
+def is_number(word):
+    try:
+        float(word)
+    except ValueError:
+        return False
+    return True
+
+
+def scores(counts):
+    # The averages and every score, under the names Textatistic used. Only uses arithmetic, so the
+    # counts can also be NumPy arrays holding the counts of many texts
+    words = counts['word_count']
+    sentences = counts['sent_count']
+    syllables = counts['sybl_count']
+    polysyllables = counts['polysyblword_count']
+
+    data = dict()
+    data['dale_chall_count'] = words - counts['notdalechall_count']
+    # Average word length, sentence length, sentences per word and familiar words
+    data['awl'] = counts['char_count'] / words
+    data['asl'] = words / sentences
+    data['asc'] = sentences / words
+    data['afw'] = data['dale_chall_count'] / words
+
+    difficult_words = counts['notdalechall_count'] / words
+    data['flesch_score'] = 206.835 - 1.015 * data['asl'] - 84.6 * (syllables / words)
+    data['fleschkincaid_score'] = -15.59 + 0.39 * data['asl'] + 11.8 * (syllables / words)
+    data['gunningfog_score'] = 0.4 * (data['asl'] + 100 * (polysyllables / words))
+    data['smog_score'] = 3.1291 + 1.0430 * (30 * (polysyllables / sentences)) ** 0.5
+    data['dalechall_score'] = (difficult_words > 0.05) * 3.6365 + \
+        15.79 * difficult_words + 0.0496 * data['asl']
+    data['ari_score'] = 4.71 * data['awl'] + 0.5 * data['asl'] - 21.43
+    data['coleman_liau_score'] = 0.0588 * (data['awl'] * 100) - \
+        0.296 * (data['asc'] * 100) - 15.8
+    return data
+
+
+def clean(text):
+    for old, new in CLEAN_REPLACEMENTS:
+        text = text.replace(old, new)
+    for regex, sub in CLEAN_REGEXES:
+        text = regex.sub(sub, text)
+    for old, new in ABBREVIATIONS:
+        text = text.replace(old, new)
+    return text
+
+
+class TextStatistics:
+    char_count: int
+    word_count: int
+    sent_count: int
+    sybl_count: int
+    polysyblword_count: int
+    notdalechall_count: int
+
+    def __init__(self, text, syllables=None):
+        # syllables returns the number of syllables in a word, and defaults to the shared memo
+        if syllables is None:
+            syllables = SyllableMemo.shared().count
+        self.char_count = 0
+        self.word_count = 0
+        self.sent_count = 0
+        self.sybl_count = 0
+        self.polysyblword_count = 0
+        self.notdalechall_count = 0
+
+        easy = easy_words()
+        for token in clean(text).split():
+            self.char_count += len(token)
+            for end in SENTENCE_ENDS:
+                self.sent_count += token.count(end)
+
+            for word in token.translate(WORD_TRANSLATION).split():
+                self.word_count += 1
+
+                lower = word.lower()
+                if lower not in easy and not is_number(lower):
+                    self.notdalechall_count += 1
+
+                word_syllables = syllables(word)
+                self.sybl_count += word_syllables
+                if word_syllables >= POLYSYLLABLE_COUNT:
+                    self.polysyblword_count += 1
+        pass
+
+    def counts(self):
+        return dict(
+            char_count=self.char_count,
+            word_count=self.word_count,
+            sent_count=self.sent_count,
+            sybl_count=self.sybl_count,
+            notdalechall_count=self.notdalechall_count,
+            polysyblword_count=self.polysyblword_count,
+        )
+
+    def dict(self):
+        # The counts, the averages and every score
+        data = self.counts()
+        data.update(scores(data))
+        return data
+
+    pass
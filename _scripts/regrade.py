@@ -0,0 +1,122 @@
+"""
+Grades every article again from the counts gen.py keeps in data/__text_stats.npz, and updates the
+difficulty in articles_index.json, and the difficulty, grade and rating in each article's JSON.
+Every article is graded at once with NumPy, using the formulas in readability.py and the grade
+scores, normalisation and difficulties in difficulty_checker.py, so changes to them can be tried
+on the whole corpus without building it.
+Articles are only counted when they are built, so articles built before the counts were kept need
+to be built once with --force. The html pages and the WeChat export keep their old values until
+their articles are built again.
+
+Usage:
+    python regrade.py [-n]
+
+Requirements:
+    - pip install numpy
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from difficulty_checker import DIFFICULTIES, GRADE_SCORES, MAX_GRADE, MAX_SCORE
+from atomic_file import write_atomic
+from gen import ARTICLES_DATA_BASE, JSON_INDEX_FILE
+from readability import scores
+from text_stats import COUNT_COLUMNS, TextStatsTable
+
+
+def grade_table(columns):
+    # The vectorised form of DifficultyChecker.run_counts and the overrides in
+    # ArticleGenerator.prepare
+    counts = {name: columns['counts'][:, i].astype(np.float64)
+              for i, name in enumerate(COUNT_COLUMNS)}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        data = scores(counts)
+
+    grades = np.mean([data[name] for name in GRADE_SCORES], axis=0)
+    grades = np.where(np.isnan(columns['grades']), grades, columns['grades'])
+    score = np.clip(grades / MAX_GRADE * MAX_SCORE, 0, MAX_SCORE)
+
+    # Rounds halves to even, like round
+    index = np.rint(score / MAX_SCORE * (len(DIFFICULTIES) - 1)).astype(np.int64)
+    difficulties = np.array(DIFFICULTIES)[index]
+    difficulties = np.where(columns['difficulties'] != '', columns['difficulties'], difficulties)
+    return grades, score, difficulties
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='Only list the articles whose grade would change')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    columns = TextStatsTable().columns()
+    load_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    grades, score, difficulties = grade_table(columns)
+    grade_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    new_difficulties = dict()
+    changed_count = 0
+    for name, grade, rating, difficulty in zip(
+            columns['names'].tolist(), grades.tolist(), score.tolist(), difficulties.tolist()):
+        path = ARTICLES_DATA_BASE / f'{name}.json'
+        if not path.exists():
+            continue
+        with path.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        # Rounded the same way as the properties gen.py writes
+        new_data = dict(difficulty=difficulty, grade=float(f'{grade:.2f}'),
+                        rating=float(f'{rating:.2f}'))
+        new_difficulties[name] = difficulty
+        if all(data.get(key) == value for key, value in new_data.items()):
+            continue
+
+        changed_count += 1
+        print(f'{name}: "{data.get("difficulty")}" {data.get("grade")} -> '
+              f'"{difficulty}" {new_data["grade"]}')
+        if not args.dry_run:
+            data.update(new_data)
+            write_atomic(path, json.dumps(data))
+
+    ungraded_count = 0
+    if JSON_INDEX_FILE.exists():
+        with JSON_INDEX_FILE.open('r', encoding='utf-8') as f:
+            index_text = f.read()
+        index_data = json.loads(index_text)
+
+        index_changed = False
+        for article_data in index_data['articles']:
+            # Older entries are lists without a difficulty
+            if isinstance(article_data, list):
+                continue
+            difficulty = new_difficulties.get(article_data['slug'])
+            if difficulty is None:
+                ungraded_count += 1
+            elif article_data['difficulty'] != difficulty:
+                article_data['difficulty'] = difficulty
+                index_changed = True
+
+        if index_changed and not args.dry_run:
+            # Keeps the final new line, if the file had one
+            write_atomic(JSON_INDEX_FILE, json.dumps(index_data, indent='\t') +
+                         index_text[len(index_text.rstrip('\n')):])
+    write_time = time.perf_counter() - start_time
+
+    print(f'Graded {len(grades)} article(s) in {grade_time * 1000:.2f}ms, '
+          f'loaded in {load_time * 1000:.1f}ms, written in {write_time * 1000:.1f}ms')
+    print(f'{changed_count} article(s) {"would change" if args.dry_run else "changed"}')
+    if ungraded_count:
+        print(f'{ungraded_count} indexed article(s) have no counts or set both their grade and '
+              f'difficulty. Build them with --force to count them')
+    pass
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,308 @@
+"""
+Scores every .docx and .txt file in a set of folders, globs or files, and writes every count,
+score and the grade DifficultyChecker gives each document to a CSV or TSV file, optionally also
+saving the numeric columns to a NumPy .npz file.
+Documents are parsed and scored in batches across a process pool, and rows are written in input
+order as soon as their batch is done. Files in folders and globs starting with _ or ~$, e.g.
+templates and Word lock files, are ignored.
+
+With --stream, JSONL {"id": ..., "text": ...} records are read from stdin instead, and a JSON
+result line with the id and every count and score is written to stdout for each record, in input
+order, as soon as it has been scored. Records that can't be scored get an "error" instead. Each
+record is scored by a warm worker process, or in this process if there is only one CPU.
+
+Usage:
+    python score_corpus.py [-o scores.csv|scores.tsv] [--npz scores.npz] [-j jobs]
+                           <folder|glob|file> ...
+    python score_corpus.py --stream [-j jobs] < records.jsonl > results.jsonl
+
+Requirements:
+    - pip install PyHyphen
+    - pip install numpy (Only for --npz)
+"""
+import argparse
+import csv
+import glob
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from difficulty_checker import DifficultyChecker, read_document
+from gen_docx import DocParser
+from readability import scores
+from syllable_memo import SyllableMemo
+from text_stats import COUNT_COLUMNS
+
+SUFFIXES = ('.docx', '.txt')
+IGNORE_PREFIXES = ('_', '~$')
+# Enough documents for each batch to be worth sending to a process
+CHUNK_SIZE = 16
+# The number of streamed records each process can be given before their results are written
+STREAM_WINDOW = 64
+INFO_COLUMNS = ('document', 'path', 'word_count_doc', 'difficulty')
+SCORE_COLUMNS = ('grade', 'score', 'awl', 'asl', 'asc', 'afw', 'dale_chall_count',
+                 'flesch_score', 'fleschkincaid_score', 'gunningfog_score', 'smog_score',
+                 'dalechall_score', 'ari_score', 'coleman_liau_score')
+NUMERIC_COLUMNS = ('word_count_doc', ) + COUNT_COLUMNS + SCORE_COLUMNS
+COLUMNS = INFO_COLUMNS + COUNT_COLUMNS + SCORE_COLUMNS
+
+worker_doc_parser = None
+worker_checker = None
+
+
+def is_document(path: Path):
+    return path.suffix in SUFFIXES and not path.name.startswith(IGNORE_PREFIXES)
+
+
+def find_files(inputs):
+    # Folders, globs and files, in the order given, without duplicates
+    paths = dict()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            found = sorted(p for p in path.iterdir() if is_document(p))
+        elif glob.has_magic(item):
+            found = sorted(p for p in map(Path, glob.glob(item, recursive=True)) if is_document(p))
+        else:
+            found = [path]
+        for p in found:
+            paths[p] = None
+    return list(paths)
+
+
+def init_worker():
+    global worker_doc_parser, worker_checker
+    worker_doc_parser = DocParser()
+    worker_doc_parser.only_content = True
+    worker_checker = DifficultyChecker()
+    pass
+
+
+def score_text(text):
+    # Every count and score of a text
+    worker_checker.run(text)
+    data = dict(worker_checker.counts)
+    data.update(scores(worker_checker.counts))
+    data.update(
+        difficulty=worker_checker.difficulty,
+        grade=worker_checker.grade,
+        score=worker_checker.score,
+    )
+    return data
+
+
+def score_file(path: Path):
+    document_name, text, word_count = read_document(worker_doc_parser, path)
+    data = score_text(text)
+    data.update(
+        document=document_name,
+        path=str(path),
+        word_count_doc=word_count,
+    )
+    return [data[name] for name in COLUMNS]
+
+
+def score_chunk(paths):
+    # A row for each path, or None if it couldn't be scored, and the syllables counted for new
+    # words, which are saved by the main process
+    if worker_checker is None:
+        init_worker()
+
+    rows = []
+    for path in paths:
+        try:
+            rows.append(score_file(path))
+        except Exception:
+            print(f'\nFailed to score "{str(path)}":\n{traceback.format_exc()}', file=sys.stderr)
+            rows.append(None)
+
+    return rows, SyllableMemo.shared().drain_new_words()
+
+
+def score_record(line):
+    # The result line for a JSONL record, and the syllables counted for new words, which are
+    # saved by the main process since workers keep running until the stream ends
+    if worker_checker is None:
+        init_worker()
+
+    record_id = None
+    try:
+        record = json.loads(line)
+        record_id = record.get('id')
+        result = dict(id=record_id)
+        result.update(score_text(record['text']))
+    except Exception as e:
+        result = dict(id=record_id, error=f'{type(e).__name__}: {e}')
+
+    return json.dumps(result), SyllableMemo.shared().drain_new_words()
+
+
+def ordered_results(executor, lines, window):
+    # Records are read and handed to the workers on another thread, so each result can be
+    # written as soon as it and the results before it are ready, even while stdin is waiting
+    futures = queue.Queue(maxsize=window)
+
+    def submit():
+        try:
+            for line in lines:
+                futures.put(executor.submit(score_record, line))
+        finally:
+            futures.put(None)
+
+    threading.Thread(target=submit, daemon=True).start()
+    while True:
+        future = futures.get()
+        if future is None:
+            return
+        yield future.result()
+
+
+def stream(jobs=None):
+    # Scores JSONL records from stdin, and writes a result line for each to stdout
+    num_workers = jobs or os.cpu_count() or 1
+    lines = (line for line in sys.stdin if line.strip())
+    memo = SyllableMemo.shared()
+
+    start_time = time.perf_counter()
+    if num_workers > 1:
+        executor = ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker)
+        results = ordered_results(executor, lines, num_workers * STREAM_WINDOW)
+    else:
+        executor = None
+        results = map(score_record, lines)
+
+    record_count = 0
+    try:
+        for result, new_words in results:
+            sys.stdout.write(result + '\n')
+            sys.stdout.flush()
+            memo.new_words.update(new_words)
+            record_count += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        memo.save()
+
+    elapsed = time.perf_counter() - start_time
+    print(f'Scored {record_count} record(s) in {elapsed:.2f}s with {num_workers} process(es)',
+          file=sys.stderr)
+    pass
+
+
+def save_npz(path: Path, rows):
+    import numpy as np
+
+    columns = dict(
+        document=np.array([row[0] for row in rows], dtype=str),
+        path=np.array([row[1] for row in rows], dtype=str),
+        difficulty=np.array([row[3] for row in rows], dtype=str),
+    )
+    for name in NUMERIC_COLUMNS:
+        i = COLUMNS.index(name)
+        columns[name] = np.array([row[i] for row in rows], dtype=np.float64)
+
+    with path.open('wb') as f:
+        np.savez(f, **columns)
+    pass
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('inputs', nargs='*', help='Folders, globs or .docx and .txt files')
+    parser.add_argument('--stream', action='store_true',
+                        help='Score JSONL {"id", "text"} records from stdin, and write JSONL '
+                             'results to stdout')
+    parser.add_argument('-o', '--output', type=Path, default=None,
+                        help='The CSV or TSV file to write. Defaults to stdout')
+    parser.add_argument('--format', choices=('csv', 'tsv'), default=None,
+                        help='Defaults to tsv for .tsv output files, and csv otherwise')
+    parser.add_argument('--npz', type=Path, default=None,
+                        help='Also save the numeric columns to this NumPy file')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='The number of processes. Defaults to the number of CPUs')
+    args = parser.parse_args()
+
+    if args.stream:
+        stream(args.jobs)
+        return
+    if not args.inputs:
+        parser.error('no inputs given')
+
+    paths = find_files(args.inputs)
+    if not paths:
+        print('No .docx or .txt files found in input', file=sys.stderr)
+        return
+
+    output_format = args.format or \
+        ('tsv' if args.output is not None and args.output.suffix == '.tsv' else 'csv')
+    num_workers = min(args.jobs or os.cpu_count() or 1, math.ceil(len(paths) / CHUNK_SIZE))
+    chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+
+    start_time = time.perf_counter()
+    output_file = args.output.open('w', encoding='utf-8', newline='') \
+        if args.output is not None else sys.stdout
+    executor = None
+    memo = SyllableMemo.shared()
+    rows = []
+    done_count = 0
+    failed_count = 0
+    num_words = 0
+    try:
+        writer = csv.writer(output_file, delimiter='\t' if output_format == 'tsv' else ',')
+        writer.writerow(COLUMNS)
+
+        if num_workers > 1:
+            executor = ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker)
+            results = executor.map(score_chunk, chunks)
+        else:
+            results = map(score_chunk, chunks)
+
+        word_count_index = COLUMNS.index('word_count')
+        for chunk_rows, new_words in results:
+            memo.new_words.update(new_words)
+            for row in chunk_rows:
+                if row is None:
+                    failed_count += 1
+                    continue
+                writer.writerow(row)
+                num_words += row[word_count_index]
+                if args.npz is not None:
+                    rows.append(row)
+            output_file.flush()
+
+            done_count += len(chunk_rows)
+            elapsed = time.perf_counter() - start_time
+            print(f'\r{done_count}/{len(paths)} document(s), {done_count / elapsed:,.1f}'
+                  f' documents/s, {num_words / elapsed:,.0f} words/s', end='', file=sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if output_file is not sys.stdout:
+            output_file.close()
+        # Keeps the syllables counted for new words for the next run
+        memo.save()
+
+    # Ends the progress line
+    print(file=sys.stderr)
+    if args.npz is not None:
+        save_npz(args.npz, rows)
+
+    elapsed = time.perf_counter() - start_time
+    scored_count = len(paths) - failed_count
+    print(f'Scored {scored_count} document(s), {num_words:,} words in {elapsed:.2f}s with '
+          f'{num_workers} process(es): {scored_count / elapsed:,.1f} documents/s, '
+          f'{num_words / elapsed:,.0f} words/s', file=sys.stderr)
+    if failed_count:
+        print(f'Failed to score {failed_count} document(s)', file=sys.stderr)
+    pass
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,147 @@
+"""
+Remembers the number of syllables in every word that has been hyphenated, so the difficulty tools
+don't hyphenate the same words on every run.
+Words are looked up in an in-process LRU cache first, then in a table kept on disk, and are only
+hyphenated if they are in neither. Words hyphenated during a run are added to the table when it is
+saved, only ever by the main process of a run, so worker processes send their new words to it.
+The table is warmed from data/dict_full.txt, the word lists and the Dale-Chall list when it
+is first created, or by running this script.
+Words are memoised exactly as they appear in the text, since capitalised words can be hyphenated
+differently.
+
+Usage:
+    python syllable_memo.py
+
+Requirements:
+    - pip install PyHyphen (The en_US dictionary is downloaded the first time it is used)
+"""
+import pickle
+import string
+from functools import lru_cache
+from pathlib import Path
+
+from atomic_file import write_atomic
+
+HYPHEN_LANGUAGE = 'en_US'
+# Next to the module, so every caller shares the same table whatever its working directory
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+SYLLABLE_MEMO_FILE = DATA_DIR / '__syllables.pickle'
+# Increase whenever the way syllables are counted changes, so the table is built again
+MEMO_VERSION = 1
+LRU_SIZE = 16384
+WARM_FILES = (DATA_DIR / 'dict_full.txt', DATA_DIR / 'dale_chall_word_list.txt')
+WARM_GLOB = 'words-*.txt'
+# Splits hyphenated words and removes all other punctuation from words. TextStatistics splits
+# texts the same way, so the warmed words match the words found in texts
+WORD_TRANSLATION = str.maketrans('-', ' ', string.punctuation.replace('-', ''))
+
+_hyphenator = None
+_shared_memo = None
+
+
+def hyphenate_syllables(word):
+    # Words are split at their hyphenation points, and every word has at least one syllable
+    global _hyphenator
+    if _hyphenator is None:
+        from hyphen import Hyphenator
+        _hyphenator = Hyphenator(HYPHEN_LANGUAGE)
+    return max(1, len(_hyphenator.syllables(word)))
+
+
+class SyllableMemo:
+    def __init__(self, path: Path = SYLLABLE_MEMO_FILE, lru_size=LRU_SIZE):
+        self.path = path
+        # Loaded on the first word that isn't in the LRU cache
+        self.table = None
+        self.new_words = dict()
+        self.count = lru_cache(maxsize=lru_size)(self.lookup)
+        pass
+
+    @staticmethod
+    def shared():
+        # The memo used by every scorer in this process
+        global _shared_memo
+        if _shared_memo is None:
+            _shared_memo = SyllableMemo()
+        return _shared_memo
+
+    def lookup(self, word):
+        if self.table is None:
+            self.load()
+
+        count = self.table.get(word)
+        if count is None:
+            count = hyphenate_syllables(word)
+            self.table[word] = count
+            self.new_words[word] = count
+        return count
+
+    def read(self):
+        # Returns the table saved on disk, or None if there isn't a usable one
+        if not self.path.exists():
+            return None
+        try:
+            with self.path.open('rb') as f:
+                version, language, table = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            print(f'Unable to read syllable memo "{str(self.path)}"')
+            return None
+        if version != MEMO_VERSION or language != HYPHEN_LANGUAGE:
+            return None
+        return table
+
+    def load(self):
+        self.table = self.read()
+        if self.table is None:
+            self.table = dict()
+            self.warm()
+        pass
+
+    def warm(self):
+        # Adds every word in the dictionary and the word lists, in lower case and capitalised,
+        # since most words in a text are one or the other
+        paths = list(WARM_FILES) + sorted(DATA_DIR.glob(WARM_GLOB))
+        for path in paths:
+            if not path.exists():
+                continue
+            with path.open('r', encoding='utf-8') as f:
+                for line in f:
+                    # The dictionary has the meaning after the word
+                    term = line.split('\t', 1)[0]
+                    for word in term.translate(WORD_TRANSLATION).split():
+                        for form in (word, word.capitalize()):
+                            if form not in self.table:
+                                self.lookup(form)
+        pass
+
+    def drain_new_words(self):
+        # Returns and forgets the words counted since the last save, e.g. to send them from a
+        # worker process to the main process
+        new_words = self.new_words
+        self.new_words = dict()
+        return new_words
+
+    def save(self):
+        if not self.new_words:
+            return
+
+        # Read again to keep the words an earlier run saved since this table was loaded. Runs that
+        # save at the same time can still lose each other's words, which are then counted again
+        table = self.read() or dict()
+        table.update(self.new_words)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.path, pickle.dumps((MEMO_VERSION, HYPHEN_LANGUAGE, table),
+                                             protocol=pickle.HIGHEST_PROTOCOL))
+        self.new_words = dict()
+        pass
+
+    pass
+
+
+if __name__ == '__main__':
+    memo = SyllableMemo()
+    memo.table = memo.read() or dict()
+    memo.warm()
+    memo.save()
+    print(f'{len(memo.table)} word(s) in "{str(memo.path)}"')
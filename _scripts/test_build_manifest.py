@@ -0,0 +1,101 @@
+"""
+Checks that an article is skipped once it has been built, including a new article, which is
+renamed after its first build, that the index files are still written if saving the manifest
+fails, and that the manifest isn't saved if writing the index files fails.
+The article is built in a synthetic copy of the site from bench_pipeline.py, with a blank spaCy
+pipeline, so no spaCy model is needed.
+
+Usage:
+    python -m unittest test_build_manifest
+
+Requirements:
+    - pip install spacy titlecase PyHyphen
+"""
+import argparse
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+from bench_pipeline import WordPool, create_site, stub_nlp
+from build_manifest import BuildManifest
+from gen import ARTICLE_INDEX_FILE, BUILD_MANIFEST_FILE, INDEX_FILE, NLP_BATCH_SIZE, \
+    WECHAT_DATA_FILE, ArticleGenerator
+from gen_docx import DocParser
+from gen_index import IndexWriter
+
+
+class NewArticleTest(unittest.TestCase):
+    def setUp(self):
+        # The scripts use paths relative to _scripts
+        self.cwd = Path.cwd()
+        scripts_dir = Path(__file__).resolve().parent
+        os.chdir(scripts_dir)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.tmp_dir.name) / 'site'
+        corpus_dir, _ = create_site(root, 1, '0', WordPool(), scripts_dir.parent)
+
+        # The site is laid out as if the article had been built, so remove its html to make it new
+        for path in root.glob('*-synthetic-*.html'):
+            path.unlink()
+
+        os.chdir(corpus_dir)
+        WECHAT_DATA_FILE.parent.mkdir(parents=True, exist_ok=True)
+        pass
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+        pass
+
+    @staticmethod
+    def build():
+        # Returns the summary line of a build of every article
+        generator = ArticleGenerator()
+        generator.nlp = stub_nlp()
+        # Keeps the sandbox's articles out of the shared parse cache
+        generator.doc_parse = DocParser(None)
+        args = argparse.Namespace(jobs=1, force=False, nlp_batch_size=NLP_BATCH_SIZE,
+                                  nlp_compare=False)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            generator.build_files(args, ['data-articles'])
+        return output.getvalue().strip().splitlines()[-1]
+
+    def test_new_article_is_skipped_after_first_build(self):
+        self.assertEqual(self.build(), 'Skipped 0, rebuilt 1, failed 0 article(s)')
+        # The first build renamed the article
+        self.assertEqual(len(list(Path('data-articles').glob('*-synthetic-00001.docx'))), 1)
+        self.assertEqual(self.build(), 'Skipped 1, rebuilt 0, failed 0 article(s)')
+        pass
+
+    def test_index_is_written_if_manifest_save_fails(self):
+        with mock.patch.object(BuildManifest, 'save', side_effect=OSError('Disk full')):
+            with self.assertRaises(OSError):
+                self.build()
+
+        # The article was renamed, so the index files must list it under its new name
+        renamed = list(Path('data-articles').glob('*-synthetic-00001.docx'))
+        self.assertEqual(len(renamed), 1)
+        self.assertIn(renamed[0].name, INDEX_FILE.read_text(encoding='utf-8'))
+        self.assertIn(renamed[0].stem, ARTICLE_INDEX_FILE.read_text(encoding='utf-8'))
+        pass
+
+    def test_manifest_is_not_saved_if_index_flush_fails(self):
+        with mock.patch.object(IndexWriter, 'flush', side_effect=OSError('Disk full')):
+            with self.assertRaises(OSError):
+                self.build()
+
+        self.assertFalse(BUILD_MANIFEST_FILE.exists())
+        # So the article is built again, and the index files written, by the next build
+        self.assertEqual(self.build(), 'Skipped 0, rebuilt 1, failed 0 article(s)')
+        pass
+
+    pass
+
+
+if __name__ == '__main__':
+    unittest.main()
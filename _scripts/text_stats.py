@@ -0,0 +1,135 @@
+"""
+Keeps the raw readability counts of every article, so the corpus can be graded again with
+different formulas or thresholds without parsing and counting every article again. See regrade.py.
+Counts are looked up by a hash of the scored text, so an article is only counted again when its
+text changes. The grade and difficulty set in an article's properties are kept with its counts,
+since they replace the calculated ones.
+The table is stored column by column in a NumPy .npz file.
+
+Requirements:
+    - pip install numpy
+"""
+import hashlib
+import io
+from pathlib import Path
+
+from atomic_file import write_atomic
+
+TEXT_STATS_FILE = Path('data/__text_stats.npz')
+# Increase whenever the way texts are counted changes, so all counts are discarded
+STATS_VERSION = 1
+COUNT_COLUMNS = ('char_count', 'word_count', 'sent_count', 'sybl_count', 'polysyblword_count',
+                 'notdalechall_count')
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class TextStatsTable:
+    def __init__(self, path: Path = TEXT_STATS_FILE):
+        self.path = path
+        # Article name to (hash, counts, grade, difficulty), loaded on first use
+        self.rows = None
+        self.hashes = None
+        self.changed = False
+        pass
+
+    def load(self):
+        import numpy as np
+
+        self.rows = dict()
+        self.hashes = dict()
+        if not self.path.exists():
+            return
+
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if int(data['version']) != STATS_VERSION or \
+                        tuple(data['count_columns']) != COUNT_COLUMNS:
+                    return
+                columns = (data['names'].tolist(), data['hashes'].tolist(),
+                           data['counts'].tolist(), data['grades'].tolist(),
+                           data['difficulties'].tolist())
+        except (OSError, ValueError, KeyError):
+            print(f'Unable to read text stats "{str(self.path)}"')
+            return
+
+        for name, text_hash, counts, grade, difficulty in zip(*columns):
+            # Grades that weren't set are stored as NaN, and difficulties as empty strings
+            grade = None if grade != grade else grade
+            self.rows[name] = (text_hash, tuple(counts), grade, difficulty or None)
+            self.hashes[text_hash] = tuple(counts)
+        pass
+
+    def get(self, text_hash):
+        # The counts for a text, or None if it hasn't been counted yet
+        if self.rows is None:
+            self.load()
+
+        counts = self.hashes.get(text_hash)
+        if counts is None:
+            return None
+        return dict(zip(COUNT_COLUMNS, counts))
+
+    def put(self, name, text_hash, counts, grade=None, difficulty=None):
+        if self.rows is None:
+            self.load()
+
+        counts = tuple(counts[column] for column in COUNT_COLUMNS)
+        row = (text_hash, counts, grade, difficulty)
+        if self.rows.get(name) != row:
+            self.rows[name] = row
+            self.hashes[text_hash] = counts
+            self.changed = True
+        pass
+
+    def remove(self, name):
+        # Articles that set both their grade and difficulty aren't scored
+        if self.rows is None:
+            self.load()
+
+        if self.rows.pop(name, None) is not None:
+            self.changed = True
+        pass
+
+    def columns(self):
+        # The whole table as NumPy arrays, one row per article
+        import numpy as np
+
+        if self.rows is None:
+            self.load()
+
+        rows = sorted(self.rows.items())
+        num_rows = len(rows)
+        counts = np.zeros((num_rows, len(COUNT_COLUMNS)), dtype=np.int64)
+        grades = np.full(num_rows, np.nan)
+        for i, (_, (_, row_counts, grade, _)) in enumerate(rows):
+            counts[i] = row_counts
+            if grade is not None:
+                grades[i] = grade
+
+        return dict(
+            names=np.array([name for name, _ in rows], dtype=str),
+            hashes=np.array([row[0] for _, row in rows], dtype=str),
+            counts=counts,
+            grades=grades,
+            difficulties=np.array([row[3] or '' for _, row in rows], dtype=str),
+        )
+
+    def save(self):
+        import numpy as np
+
+        if not self.changed:
+            return
+
+        columns = self.columns()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = io.BytesIO()
+        np.savez(data, version=np.array(STATS_VERSION), count_columns=np.array(COUNT_COLUMNS),
+                 **columns)
+        write_atomic(self.path, data.getvalue())
+        self.changed = False
+        pass
+
+    pass
@@ -6,6 +6,8 @@ from pathlib import Path
 
 import requests
 
+from wechat_journal import compact_journal
+
 APP_ID = 'wx36c6dbf8b59bdb4f'
 APP_SECRET = 'b753ab2203e83db494818999af7a23fb'
 API_CHUNK_SIZE = 15
@@ -75,6 +77,8 @@ def get_access_token():
 
 def run():
     import_data_file = BASE_PATH / 'data.json'
+    # Include any articles from a build that was interrupted before it could compact the journal
+    compact_journal(BASE_PATH / 'data.jsonl', import_data_file)
     if not import_data_file.exists():
         print('No data to import')
         return
@@ -0,0 +1,87 @@
+"""
+The articles exported for the WeChat import are appended to a JSON lines journal, one article per
+line, instead of rewriting the whole of data.json for every article.
+The journal is compacted into data.json, which is what wechat_import.py reads, at the end of a
+build and before importing. If a build is interrupted, every article that was appended and synced
+before that is still compacted the next time.
+"""
+import json
+import os
+from pathlib import Path
+
+from atomic_file import write_atomic
+
+# Number of articles appended between each sync to disk
+SYNC_BATCH_SIZE = 16
+
+
+class WechatJournal:
+    def __init__(self, path: Path, sync_batch_size=SYNC_BATCH_SIZE):
+        self.path = path
+        self.sync_batch_size = sync_batch_size
+        self.file = None
+        self.unsynced = 0
+        pass
+
+    def append(self, key, data):
+        if self.file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = self.path.open('a', encoding='utf-8')
+
+        self.file.write(json.dumps([key, data]) + '\n')
+        self.unsynced += 1
+        if self.unsynced >= self.sync_batch_size:
+            self.sync()
+        pass
+
+    def sync(self):
+        if self.file is None or not self.unsynced:
+            return
+
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        pass
+
+    def close(self):
+        if self.file is None:
+            return
+
+        self.sync()
+        self.file.close()
+        self.file = None
+        pass
+
+    pass
+
+
+def compact_journal(journal_file: Path, data_file: Path, indent='\t'):
+    # Applies the journal to data_file in order, so the latest export of each article wins, then
+    # removes the journal. Returns the number of articles applied
+    if not journal_file.exists():
+        return 0
+
+    if data_file.exists():
+        with data_file.open('r') as f:
+            data = json.load(f)
+    else:
+        data = dict()
+
+    count = 0
+    with journal_file.open('r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                key, value = json.loads(line)
+            except ValueError:
+                # The last line may be incomplete if a build was interrupted while writing it
+                print(f'Skipping invalid line {line_number} in "{str(journal_file)}"')
+                continue
+            data[key] = value
+            count += 1
+
+    write_atomic(data_file, json.dumps(data, indent=indent))
+    journal_file.unlink()
+
+    return count